@@ -0,0 +1,483 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Call tape: everything the scene export sends to the YafaRay interface,
+# recorded in order into a compact binary file. A later render of the same
+# frame of the same saved .blend file replays the tape into a fresh
+# interface instead of exporting the scene from bpy again.
+#
+# Tapes are stored under the SHA-256 hash of their content, so frames with
+# identical exports share one file, and a small key file per blend file,
+# scene and frame points to the tape of that frame. The content hash is
+# checked again when a tape is loaded. When the tapes in the directory take
+# more than the allowed disk space, the least recently used ones are deleted
+# together with the keys pointing to them.
+#
+# Arguments are plain values (bool, int, float, str, None), NumPy buffers,
+# lists of them, handles returned by earlier calls (materials...), 4x4
+# matrices and float arrays. Anything else makes the tape invalid and it is
+# not saved. Returned IDs are checked during the replay, a fresh interface
+# must give the same ones.
+
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import zlib
+import numpy as np
+import yafaray_v3_interface
+
+TAPE_MAGIC = b"YAFTAPE1"
+TAPE_EXTENSION = ".yftape"
+KEY_EXTENSION = ".yfkey"
+
+
+class TapeError(Exception):
+    pass
+
+
+class HandleRef(object):
+    # Value returned by the call at this index of the tape
+    def __init__(self, index):
+        self.index = index
+
+
+class MatrixValue(object):
+    # matrix4x4_t, 16 floats row after row
+    def __init__(self, values):
+        self.values = values
+
+
+class FloatArrayValue(object):
+    # SWIG float array, such as the texture mapping matrices of paramsSetMemMatrix
+    def __init__(self, values):
+        self.values = values
+
+
+class TapeWriter(object):
+    def __init__(self):
+        self.data = bytearray()
+
+    def pack(self, fmt, *values):
+        self.data += struct.pack("<" + fmt, *values)
+
+    def string(self, value):
+        encoded = value.encode("utf-8")
+        self.pack("I", len(encoded))
+        self.data += encoded
+
+    def value(self, value):
+        if value is None:
+            self.data += b"n"
+        elif value is True:
+            self.data += b"T"
+        elif value is False:
+            self.data += b"F"
+        elif isinstance(value, int):
+            self.data += b"i"
+            self.pack("q", value)
+        elif isinstance(value, float):
+            self.data += b"d"
+            self.pack("d", value)
+        elif isinstance(value, str):
+            self.data += b"s"
+            self.string(value)
+        elif isinstance(value, np.ndarray):
+            self.data += b"a"
+            self.string(value.dtype.str)
+            self.pack("B", value.ndim)
+            self.pack("{0}Q".format(value.ndim), *value.shape)
+            self.data += np.ascontiguousarray(value).tobytes()
+        elif isinstance(value, list):
+            self.data += b"l"
+            self.pack("I", len(value))
+            for item in value:
+                self.value(item)
+        elif isinstance(value, HandleRef):
+            self.data += b"h"
+            self.pack("I", value.index)
+        elif isinstance(value, MatrixValue):
+            self.data += b"m"
+            self.pack("16d", *value.values)
+        elif isinstance(value, FloatArrayValue):
+            self.data += b"f"
+            self.pack("I", len(value.values))
+            self.pack("{0}d".format(len(value.values)), *value.values)
+        else:
+            raise TapeError("Cannot write a value of type {0}".format(type(value).__name__))
+
+
+class TapeReader(object):
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, fmt):
+        fmt = "<" + fmt
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def string(self):
+        size, = self.unpack("I")
+        value = bytes(self.data[self.offset:self.offset + size]).decode("utf-8")
+        self.offset += size
+        return value
+
+    def value(self):
+        tag = bytes(self.data[self.offset:self.offset + 1])
+        self.offset += 1
+        if tag == b"n":
+            return None
+        elif tag == b"T":
+            return True
+        elif tag == b"F":
+            return False
+        elif tag == b"i":
+            return self.unpack("q")[0]
+        elif tag == b"d":
+            return self.unpack("d")[0]
+        elif tag == b"s":
+            return self.string()
+        elif tag == b"a":
+            dtype = np.dtype(self.string())
+            ndim, = self.unpack("B")
+            shape = self.unpack("{0}Q".format(ndim))
+            size = int(np.prod(shape)) * dtype.itemsize
+            value = np.frombuffer(self.data[self.offset:self.offset + size], dtype=dtype).reshape(shape).copy()
+            self.offset += size
+            return value
+        elif tag == b"l":
+            count, = self.unpack("I")
+            return [self.value() for i in range(count)]
+        elif tag == b"h":
+            return HandleRef(self.unpack("I")[0])
+        elif tag == b"m":
+            return MatrixValue(self.unpack("16d"))
+        elif tag == b"f":
+            count, = self.unpack("I")
+            return FloatArrayValue(self.unpack("{0}d".format(count)))
+        else:
+            raise TapeError("Unknown value tag {0!r} at offset {1}".format(tag, self.offset - 1))
+
+
+class CallTape(object):
+    def __init__(self):
+        self.calls = []  # (method name, arguments, returned ID to check or None)
+        self.contentHash = None
+
+    def encode(self):
+        names = sorted({name for name, args, result in self.calls})
+        nameIndex = {name: i for i, name in enumerate(names)}
+
+        writer = TapeWriter()
+        writer.pack("I", len(names))
+        for name in names:
+            writer.string(name)
+        writer.pack("I", len(self.calls))
+        for name, args, result in self.calls:
+            writer.pack("HB", nameIndex[name], len(args))
+            for arg in args:
+                writer.value(arg)
+            writer.value(result)
+
+        return bytes(writer.data)
+
+    @staticmethod
+    def decode(payload):
+        tape = CallTape()
+        reader = TapeReader(payload)
+        names = [reader.string() for i in range(reader.unpack("I")[0])]
+        for i in range(reader.unpack("I")[0]):
+            nameIndex, numArgs = reader.unpack("HB")
+            args = [reader.value() for j in range(numArgs)]
+            tape.calls.append((names[nameIndex], args, reader.value()))
+
+        return tape
+
+    def save(self, directory, key, maxSize=0):
+        # Returns the content hash, the tape is only written if no other frame
+        # has the same one. With maxSize (bytes) the oldest tapes are deleted
+        # until the directory fits.
+        payload = self.encode()
+        self.contentHash = hashlib.sha256(payload).hexdigest()
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.contentHash + TAPE_EXTENSION)
+        if not os.path.exists(path):
+            writeAtomic(path, TAPE_MAGIC + bytes.fromhex(self.contentHash) + zlib.compress(payload, 6))
+        else:
+            touch(path)
+        writeAtomic(os.path.join(directory, key + KEY_EXTENSION), self.contentHash.encode("ascii"))
+
+        if maxSize > 0:
+            pruneTapes(directory, maxSize, self.contentHash)
+
+        return self.contentHash
+
+    @staticmethod
+    def load(directory, key):
+        # None when there is no tape for the key, TapeError when the tape is damaged
+        try:
+            with open(os.path.join(directory, key + KEY_EXTENSION), "rb") as f:
+                contentHash = f.read().decode("ascii").strip()
+            with open(os.path.join(directory, contentHash + TAPE_EXTENSION), "rb") as f:
+                data = f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+        touch(os.path.join(directory, contentHash + TAPE_EXTENSION))  # recently used, see pruneTapes
+
+        if not data.startswith(TAPE_MAGIC):
+            raise TapeError("Not a call tape: {0}".format(contentHash))
+        storedHash = data[len(TAPE_MAGIC):len(TAPE_MAGIC) + 32].hex()
+        try:
+            payload = zlib.decompress(data[len(TAPE_MAGIC) + 32:])
+        except zlib.error as e:
+            raise TapeError("Damaged call tape {0}: {1}".format(contentHash, e))
+        if storedHash != contentHash or hashlib.sha256(payload).hexdigest() != contentHash:
+            raise TapeError("Content hash mismatch in call tape {0}".format(contentHash))
+
+        tape = CallTape.decode(payload)
+        tape.contentHash = contentHash
+        return tape
+
+    def replay(self, yi):
+        results = {}
+        for index, (name, args, expected) in enumerate(self.calls):
+            floatArrays = []
+            args = [resolveValue(arg, yi, results, floatArrays) for arg in args]
+            try:
+                result = getattr(yi, name)(*args)
+            finally:
+                for array in floatArrays:
+                    yafaray_v3_interface.delete_floatArray(array)
+
+            if expected is not None and result != expected:
+                raise TapeError("Call {0} ({1}) returned {2!r} instead of {3!r}".format(index, name, result, expected))
+            if isHandle(result):
+                results[index] = result
+
+        return len(self.calls)
+
+
+def isHandle(value):
+    # Objects returned by the interface, such as materials
+    return value is not None and not isinstance(value, (bool, int, float, str))
+
+
+def resolveValue(value, yi, results, floatArrays):
+    if isinstance(value, HandleRef):
+        return results[value.index]
+    elif isinstance(value, list):
+        return [resolveValue(item, yi, results, floatArrays) for item in value]
+    elif isinstance(value, MatrixValue):
+        return makeMatrix(value.values, yi)
+    elif isinstance(value, FloatArrayValue):
+        array = makeFloatArray(value.values)
+        floatArrays.append(array)
+        return array
+
+    return value
+
+
+def makeMatrix(values, yi):
+    matrix = yafaray_v3_interface.matrix4x4_t()
+    for i in range(4):
+        for j in range(4):
+            matrix.setVal(i, j, values[i * 4 + j])
+
+    # replaying into a recorder
+    noteMatrix = getattr(yi, "noteMatrix", None)
+    if noteMatrix is not None:
+        noteMatrix(matrix, [values[i:i + 4] for i in range(0, 16, 4)])
+
+    return matrix
+
+
+def makeFloatArray(values):
+    # must be deleted with delete_floatArray after the call
+    array = yafaray_v3_interface.new_floatArray(len(values))
+    for i, item in enumerate(values):
+        yafaray_v3_interface.floatArray_setitem(array, i, item)
+    return array
+
+
+class TapeRecorder(object):
+    # Stands in for the interface: every call is passed on to it and, while
+    # recording, also appended to the tape. The exporter can use it exactly
+    # like the interface, hasattr checks for the optional entry points give
+    # the same answers.
+    CHECKED_RESULTS = {"getNextFreeID", "addVertex", "addUV", "addUVArray"}
+
+    def __init__(self, yi):
+        self.yi = yi
+        self.tape = CallTape()
+        self.recording = False
+        self.invalid = None  # reason why the tape can't be replayed
+        self.handles = {}  # id of returned object -> (tape value, object)
+        self.matrices = {}  # id of matrix4x4_t -> values, see noteMatrix
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.recording = True
+
+    def stop(self):
+        self.recording = False
+        self.handles = {}
+        self.matrices = {}
+
+    def noteMatrix(self, matrix, values):
+        # matrix4x4_t can't be read back, yafObject tells the values of the ones it creates
+        if self.recording:
+            self.matrices[id(matrix)] = [float(values[i][j]) for i in range(4) for j in range(4)]
+
+        # recorders can be stacked
+        noteMatrix = getattr(self.yi, "noteMatrix", None)
+        if noteMatrix is not None:
+            noteMatrix(matrix, values)
+
+    def __getattr__(self, name):
+        method = getattr(self.yi, name)
+        if not callable(method):
+            return method
+
+        def call(*args):
+            if not self.recording:
+                return method(*args)
+
+            with self.lock:
+                tapeArgs = [self.tapeValue(arg) for arg in args]
+                result = method(*args)
+                self.record(name, tapeArgs, result)
+                return result
+
+        return call
+
+    def record(self, name, tapeArgs, result):
+        index = len(self.tape.calls)
+        expected = result if name in self.CHECKED_RESULTS and isinstance(result, int) else None
+        self.tape.calls.append((name, tapeArgs, expected))
+        if isHandle(result):
+            self.handles[id(result)] = (HandleRef(index), result)  # keeps the object alive so its id stays unique
+
+    def tapeValue(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        elif isinstance(value, np.integer):
+            return int(value)
+        elif isinstance(value, np.floating):
+            return float(value)
+        elif isinstance(value, np.ndarray):
+            # the buffers are not changed after being sent, they are encoded when the tape is saved
+            return value
+        elif isinstance(value, (list, tuple)):
+            return [self.tapeValue(item) for item in value]
+        elif id(value) in self.handles:
+            return self.handles[id(value)][0]
+        elif id(value) in self.matrices:
+            return MatrixValue(self.matrices.pop(id(value)))
+        elif "float *" in repr(value):
+            # SWIG float arrays can be read with floatArray_getitem, they are always 4x4 matrices here
+            getitem = getattr(yafaray_v3_interface, "floatArray_getitem", None)
+            if getitem is not None:
+                return FloatArrayValue([float(getitem(value, i)) for i in range(16)])
+
+        self.unsupported(value)
+        return None
+
+    def unsupported(self, value):
+        if self.invalid is None:
+            self.invalid = "argument of type {0}".format(type(value).__name__)
+
+
+def tapeKey(blendPath, scene, renderType, exporterVersion):
+    # Identifies a frame of a saved .blend file, the file modification time
+    # and size stand for everything in it
+    stat = os.stat(blendPath)
+    key = repr((os.path.abspath(blendPath), stat.st_mtime_ns, stat.st_size, scene.name,
+                scene.frame_current, scene.frame_subframe, renderType, exporterVersion))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def tapeDirectory(directory):
+    return directory if directory else os.path.join(tempfile.gettempdir(), "yafaray_call_tapes")
+
+
+def touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def pruneTapes(directory, maxSize, keepHash=None):
+    # Delete the least recently used tapes (modification time, updated when
+    # a tape is saved or loaded) until the tapes take at most maxSize bytes,
+    # and the keys pointing to them. The tape of keepHash is never deleted.
+    # Returns the number of tapes deleted.
+    tapes = []
+    keys = []
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.name.endswith(TAPE_EXTENSION):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            tapes.append((stat.st_mtime_ns, entry.name[:-len(TAPE_EXTENSION)], stat.st_size))
+            total += stat.st_size
+        elif entry.name.endswith(KEY_EXTENSION):
+            keys.append(entry.path)
+
+    if total <= maxSize:
+        return 0
+
+    removed = set()
+    for mtime, contentHash, size in sorted(tapes):
+        if total <= maxSize:
+            break
+        if contentHash == keepHash:
+            continue
+        try:
+            os.remove(os.path.join(directory, contentHash + TAPE_EXTENSION))
+        except OSError:
+            continue
+        removed.add(contentHash)
+        total -= size
+
+    for path in keys:
+        try:
+            with open(path, "rb") as f:
+                contentHash = f.read().decode("ascii").strip()
+            if contentHash in removed:
+                os.remove(path)
+        except (OSError, UnicodeDecodeError):
+            pass
+
+    return len(removed)
+
+
+def writeAtomic(path, data):
+    # other render nodes may read the same directory
+    tmpPath = "{0}.{1}.tmp".format(path, os.getpid())
+    with open(tmpPath, "wb") as f:
+        f.write(data)
+    os.replace(tmpPath, path)
@@ -0,0 +1,169 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# View of the active camera as YafaRay renders it, used to estimate how big
+# objects are in the final image (level of detail) and whether they can be
+# seen at all. Works on world space bounding boxes only, no mesh data needed.
+
+import math
+import numpy as np
+from .. import yaf_global_vars
+
+
+def getCameraView(scene):
+    # None when there is no camera or the camera type has no simple view
+    # frustum, and when rendering the 3D view, whose view matrix is not known
+    # here
+    if yaf_global_vars.useViewToRender:
+        return None
+    if scene.camera is None or scene.camera.type != 'CAMERA':
+        return None
+
+    render = scene.render
+    if not render.use_multiview:
+        cameras = [scene.camera]
+    else:
+        # the cameras of the rendered views, see yafObject.createCameras
+        cameras = []
+        camera_base_name = scene.camera.name.rsplit('_', 1)[0]
+        for view in render.views:
+            if view.use and not (render.views_format == "STEREO_3D" and view.name != "left" and view.name != "right"):
+                camera = scene.objects.get(camera_base_name + view.camera_suffix)
+                if camera is None or camera.type != 'CAMERA':
+                    return None
+                cameras.append(camera)
+        if not cameras:
+            return None
+
+    for camera in cameras:
+        if camera.data.camera_type not in {"perspective", "architect", "orthographic"}:
+            return None
+
+    if len(cameras) == 1:
+        return CameraView(scene, cameras[0])
+    return MultiCameraView([CameraView(scene, camera) for camera in cameras])
+
+
+class MultiCameraView(object):
+    # Union of the views of several cameras (multiview renders): a box is seen
+    # when any camera sees it and its size is the largest one in any view
+    def __init__(self, views):
+        self.views = views
+
+    def boxesInFrustum(self, corners, margin=0.0):
+        inside = self.views[0].boxesInFrustum(corners, margin)
+        for view in self.views[1:]:
+            inside |= view.boxesInFrustum(corners, margin)
+        return inside
+
+    def projectedSize(self, bbMin, bbMax):
+        return max(view.projectedSize(bbMin, bbMax) for view in self.views)
+
+
+class CameraView(object):
+    def __init__(self, scene, cameraObject):
+        render = scene.render
+        camera = cameraObject.data
+
+        # same image size and field of view as the YafaRay camera, see yafObject.createCameras
+        self.sizeX = max(int(render.resolution_x * render.resolution_percentage * 0.01), 1)
+        self.sizeY = max(int(render.resolution_y * render.resolution_percentage * 0.01), 1)
+        self.ortho = camera.camera_type == "orthographic"
+
+        if self.ortho:
+            self.halfX = camera.ortho_scale * 0.5
+        else:
+            if camera.sensor_fit == 'AUTO':
+                horizontal_fit = (self.sizeX > self.sizeY)
+                sensor_size = camera.sensor_width
+            elif camera.sensor_fit == 'HORIZONTAL':
+                horizontal_fit = True
+                sensor_size = camera.sensor_width
+            else:
+                horizontal_fit = False
+                sensor_size = camera.sensor_height
+
+            f_aspect = 1.0 if horizontal_fit else self.sizeX / self.sizeY
+            # tangent of half the horizontal field of view
+            self.halfX = f_aspect * sensor_size / (2.0 * camera.lens)
+
+        self.halfY = self.halfX * self.sizeY / self.sizeX
+
+        # lens shift moves the rendered region, see yaf_scene.getRenderCoords
+        maxsize = max(self.sizeX, self.sizeY)
+        self.centerX = 2.0 * self.halfX * camera.shift_x * maxsize / self.sizeX
+        self.centerY = 2.0 * self.halfY * camera.shift_y * maxsize / self.sizeY
+
+        if camera.use_clipping:
+            self.clipStart = camera.clip_start
+            self.clipEnd = camera.clip_end
+        else:
+            self.clipStart = 0.0
+            self.clipEnd = math.inf
+
+        # Blender cameras look down their local -Z axis
+        self.worldToCamera = np.array(cameraObject.matrix_world.inverted(), dtype=np.float64)
+
+    def toCamera(self, co):
+        m = self.worldToCamera
+        return np.dot(np.asarray(co, dtype=np.float64), m[:3, :3].T) + m[:3, 3]
+
+    def boundingSphere(self, bbMin, bbMax):
+        # camera space center and radius of the sphere around a world space box
+        bbMin = np.asarray(bbMin, dtype=np.float64)
+        bbMax = np.asarray(bbMax, dtype=np.float64)
+        center = self.toCamera(((bbMin + bbMax) * 0.5)[np.newaxis])[0]
+        return center, float(np.linalg.norm(bbMax - bbMin)) * 0.5
+
+    def boxesInFrustum(self, corners, margin=0.0):
+        # For world space boxes given by their corners (n, 8, 3), True where
+        # the box may be seen. The view is widened by margin (a fraction of
+        # the image size) on every side. A box is only rejected when all its
+        # corners are outside the same side of the view.
+        co = self.toCamera(corners.reshape(-1, 3)).reshape(-1, 8, 3)
+        x = co[:, :, 0]
+        y = co[:, :, 1]
+        depth = -co[:, :, 2]
+        halfX = self.halfX * (1.0 + 2.0 * margin)
+        halfY = self.halfY * (1.0 + 2.0 * margin)
+        if self.ortho:
+            scale = 1.0
+        else:
+            scale = depth  # the sides of the view go through the camera position
+
+        outside = (depth < self.clipStart * (1.0 - margin)).all(axis=1)
+        outside |= (depth > self.clipEnd * (1.0 + margin)).all(axis=1)
+        outside |= (x < (self.centerX - halfX) * scale).all(axis=1)
+        outside |= (x > (self.centerX + halfX) * scale).all(axis=1)
+        outside |= (y < (self.centerY - halfY) * scale).all(axis=1)
+        outside |= (y > (self.centerY + halfY) * scale).all(axis=1)
+        return ~outside
+
+    def projectedSize(self, bbMin, bbMax):
+        # Approximate size in pixels of a world space box in the image, inf
+        # when the camera is inside or very close to it
+        center, radius = self.boundingSphere(bbMin, bbMax)
+        if self.ortho:
+            return 2.0 * radius * self.sizeX / (2.0 * self.halfX)
+
+        depth = -center[2]
+        if depth <= radius:
+            return math.inf
+        return 2.0 * radius * self.sizeX / (2.0 * self.halfX * depth)
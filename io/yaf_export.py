@@ -34,10 +34,17 @@ from .. import PLUGIN_PATH
 from .. import YAF_ID_NAME
 from .. import YAFARAY_EXPORTER_VERSION
 from .yaf_object import yafObject
+from .yaf_profiler import ExportProfiler
 from .yaf_light  import yafLight
 from .yaf_world  import yafWorld
 from .yaf_integrator import yafIntegrator
 from . import yaf_scene
+from . import yaf_geometry
+from . import yaf_call_tape
+from . import yaf_export_session
+from . import yaf_interface_pool
+from . import yaf_scene_index
+from . import yaf_material_graph
 from .yaf_texture import yafTexture
 from .yaf_material import yafMaterial
 from ..ot import yafaray_presets
@@ -54,9 +61,14 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
     yaf_global_vars.useViewToRender = False
     yaf_global_vars.viewMatrix = None
 
-    def setInterface(self, yi):
+    def setInterface(self, yi, warm=False):
         self.materialMap = {}
         self.materials = set()
+        if self.recordCallTape:
+            yi = self.tapeRecorder = yaf_call_tape.TapeRecorder(yi)  # records the scene export once started
+        if self.session is not None:
+            # on top of the tape recorder, so the replayed segments are also on the tape
+            yi = self.sessionRecorder = yaf_export_session.SessionRecorder(yi, self.session)
         self.yi = yi
 
         if self.is_preview:
@@ -73,69 +85,206 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
             self.yi.printInfo("Exporter: Blender version " + str(bpy.app.version[0]) + "."+ str(bpy.app.version[1]) + "."+ str(bpy.app.version[2]) + "."+ bpy.app.version_char + "  Build information: " + bpy.app.build_platform.decode("utf-8") + ", " + bpy.app.build_type.decode("utf-8") + ", branch: " + bpy.app.build_branch.decode("utf-8") + ", hash: " + bpy.app.build_hash.decode("utf-8"))
             self.yi.printInfo("Exporter: System information: " + platform.processor() + ", " + platform.platform())
 
-        self.yi.loadPlugins(PLUGIN_PATH)
+        if not warm:
+            self.yi.loadPlugins(PLUGIN_PATH)
+        self.yi.printInfo("Exporter: {0} interface ready {1:.3f} s after the render start".format(
+            "Warm" if warm else "New", time.time() - self.renderStartTime))
+        if self.pooledInterface is not None:
+            self.yi.printInfo(yaf_interface_pool.interfacePool.statistics())
         self.yaf_object = yafObject(self.yi, self.materialMap, self.is_preview)
+        self.yaf_object.profiler = self.profiler
         self.yaf_lamp = yafLight(self.yi, self.is_preview)
         self.yaf_world = yafWorld(self.yi)
         self.yaf_integrator = yafIntegrator(self.yi)
         self.yaf_texture = yafTexture(self.yi)
         self.yaf_material = yafMaterial(self.yi, self.materialMap, self.yaf_texture.loadedTextures)
 
+    def acquireInterface(self):
+        # A warm interface from the process wide pool when possible, (interface, warm)
+        self.pooledInterface = None
+        if not self.scene.yafaray.export.interfacePool:
+            return yafaray_v3_interface.yafrayInterface_t(), False
+
+        yi = yaf_interface_pool.interfacePool.acquire(PLUGIN_PATH)
+        warm = yi is not None
+        if yi is None:
+            yi = yafaray_v3_interface.yafrayInterface_t()
+        self.pooledInterface = yi
+        return yi, warm
+
+    def releaseInterface(self):
+        self.yi.clearAll()
+        if self.pooledInterface is not None:
+            yaf_interface_pool.interfacePool.release(self.pooledInterface, PLUGIN_PATH)
+            self.pooledInterface = None
+        del self.yi
+
     def exportScene(self):
-        for obj in self.scene.objects:
-            self.exportTexture(obj)
-        self.exportMaterials()
+        self.yi.printInfo(self.sceneIndex.statistics())
+        self.materialGraph = yaf_material_graph.MaterialGraph()
+        with self.profiler.section("exportTextures"):
+            self.exportMaterialTextures(self.sceneIndex.materials)
+        with self.profiler.section("exportMaterials"):
+            self.exportMaterials()
         self.yaf_object.setScene(self.scene)
-        self.exportObjects()
-        self.yaf_object.createCameras()
+        with self.profiler.section("exportObjects"):
+            self.exportObjects()
+        with self.profiler.section("createCameras"):
+            self.yaf_object.createCameras()
         
-        if self.is_preview and bpy.data.scenes[0].yafaray.preview.enable and bpy.data.scenes[0].yafaray.preview.previewBackground == "world":
-            self.yaf_world.exportWorld(bpy.data.scenes[0], self.is_preview)
-        else:
-            self.yaf_world.exportWorld(self.scene, self.is_preview)
+        with self.profiler.section("exportWorld"):
+            if self.is_preview and bpy.data.scenes[0].yafaray.preview.enable and bpy.data.scenes[0].yafaray.preview.previewBackground == "world":
+                self.yaf_world.exportWorld(bpy.data.scenes[0], self.is_preview)
+            else:
+                self.yaf_world.exportWorld(self.scene, self.is_preview)
+
+    def writeProfile(self, output_path):
+        # JSON and CSV reports next to the render output and the top offenders in the console
+        if not self.profiler.enabled:
+            return
+
+        for line in self.profiler.summary():
+            self.yi.printInfo(line)
+
+        output = self.output if getattr(self, "output", "") else self.decideOutputFileName(output_path, 'XML')[1]
+        info = {
+            "blend_file": bpy.data.filepath,
+            "scene": self.scene.name,
+            "frame": self.scene.frame_current,
+            "exporter_version": YAFARAY_EXPORTER_VERSION,
+        }
+        try:
+            jsonPath, csvPath = self.profiler.writeReport(output + " - export profile", info)
+            self.yi.printInfo("Exporter: Profile report written to {0} and {1}".format(jsonPath, csvPath))
+        except OSError as e:
+            self.yi.printWarning("Exporter: Could not write the profile report: {0}".format(e))
+
+    def getCallTapeKey(self, scene):
+        # Returns the tape key and why there is none. Only a saved .blend file
+        # without unsaved changes can be identified, see yaf_call_tape.tapeKey
+        if not scene.yafaray.export.callTape or self.is_preview:
+            return None, ""
+        if yaf_global_vars.useViewToRender:
+            return None, "rendering the 3D view"
+        if bpy.data.filepath == "":
+            return None, "the .blend file is not saved"
+        if bpy.data.is_dirty:
+            return None, "the .blend file has unsaved changes"
+
+        return yaf_call_tape.tapeKey(bpy.data.filepath, scene, scene.gs_type_render, YAFARAY_EXPORTER_VERSION), ""
+
+    def loadCallTape(self):
+        if self.callTapeKey is None:
+            return None
+
+        directory = yaf_call_tape.tapeDirectory(bpy.path.abspath(self.scene.yafaray.export.callTapeDirectory))
+        try:
+            return yaf_call_tape.CallTape.load(directory, self.callTapeKey)
+        except yaf_call_tape.TapeError as e:
+            print("Exporter: Call tape not used: {0}".format(e))
+            return None
+
+    def replayCallTape(self, tape):
+        self.yi.printInfo("Exporter: Replaying call tape {0}".format(tape.contentHash))
+        start = time.time()
+        try:
+            with self.profiler.section("replayCallTape"):
+                calls = tape.replay(self.yi)
+        except yaf_call_tape.TapeError as e:
+            self.yi.printWarning("Exporter: Call tape replay failed, exporting the scene again: {0}".format(e))
+            return False
+
+        self.yi.printInfo("Exporter: Call tape replayed, {0} calls in {1:.2f} s".format(calls, time.time() - start))
+        return True
+
+    def saveCallTape(self):
+        recorder = self.tapeRecorder
+        recorder.stop()
+        tape = recorder.tape
+        recorder.tape = yaf_call_tape.CallTape()  # don't keep the geometry buffers during the render
+        if recorder.invalid is not None:
+            self.yi.printWarning("Exporter: Call tape not saved, it can't be replayed: {0}".format(recorder.invalid))
+            return
+
+        directory = yaf_call_tape.tapeDirectory(bpy.path.abspath(self.scene.yafaray.export.callTapeDirectory))
+        try:
+            with self.profiler.section("saveCallTape"):
+                contentHash = tape.save(directory, self.callTapeKey, self.scene.yafaray.export.callTapeMaxSize * 1048576)
+        except (OSError, yaf_call_tape.TapeError) as e:
+            self.yi.printWarning("Exporter: Could not save the call tape: {0}".format(e))
+            return
+
+        self.yi.printInfo("Exporter: Call tape {0} saved, {1} calls".format(contentHash, len(tape.calls)))
+
+    def beginSession(self):
+        reason = self.session.begin(yaf_export_session.settingsFingerprint(self.scene))
+        if reason is not None:
+            self.yi.printInfo("Exporter: Incremental export: exporting everything again, {0}".format(reason))
+        self.sessionRecorder.start()
+
+    def finishSession(self):
+        self.sessionRecorder.stop()
+        for line in self.session.finish():
+            self.yi.printInfo(line)
 
     def exportTexture(self, obj):
-        # First export the textures of the materials type 'blend'
-        for mat_slot in [m for m in obj.material_slots if m.material is not None]:
-            if mat_slot.material.mat_type == 'blend':
-                blendmat_error = False
-                try:
-                    mat1 = bpy.data.materials[mat_slot.material.material1name]
-                except:
-                    self.yi.printWarning("Exporter: Problem with blend material:\"{0}\". Could not find the first material:\"{1}\"".format(mat_slot.material.name,mat_slot.material.material1name))
-                    blendmat_error = True
-                try:
-                    mat2 = bpy.data.materials[mat_slot.material.material2name]
-                except:
-                    self.yi.printWarning("Exporter: Problem with blend material:\"{0}\". Could not find the second material:\"{1}\"".format(mat_slot.material.name,mat_slot.material.material2name))
-                    blendmat_error = True
-                if blendmat_error:
-                    continue
-                for bm in [mat1, mat2]:
-                    for blendtex in [bt for bt in bm.texture_slots if (bt and bt.texture and bt.use)]:
-                        if self.is_preview and blendtex.texture.name == 'fakeshadow':
-                            continue
-                        self.yaf_texture.writeTexture(self.scene, blendtex.texture)
-            else:
+        self.exportMaterialTextures([m.material for m in obj.material_slots if m.material is not None])
+
+    def exportMaterialTextures(self, materials):
+        # Textures not exported yet of the materials and the materials they blend, see MaterialGraph
+        for tex in self.materialGraph.pendingTextures(materials):
+            if self.is_preview and tex.name == "fakeshadow":
                 continue
+            with self.profiler.section("exportTexture", tex.name):
+                self.writeTexture(tex)
 
-        for mat_slot in [m for m in obj.material_slots if m.material is not None]:
-            for tex in [t for t in mat_slot.material.texture_slots if (t and t.texture and t.use)]:
-                if self.is_preview and tex.texture.name == "fakeshadow":
-                    continue
-                self.yaf_texture.writeTexture(self.scene, tex.texture)
+    def writeTexture(self, tex):
+        # Replayed from the incremental export session when nothing changed
+        if self.session is None or tex.name in self.yaf_texture.loadedTextures:
+            self.yaf_texture.writeTexture(self.scene, tex)
+            return
+
+        key = "TE:" + tex.name
+        fingerprint, volatile = yaf_export_session.textureFingerprint(tex, self.scene.frame_current)
+        if self.session.check(key, fingerprint, (), volatile) is None:
+            if self.session.replay(self.yi, key):
+                self.yaf_texture.loadedTextures.add(tex.name)
+            return
 
-    def object_on_visible_layer(self, obj):
-        obj_visible = False
-        for layer_visible in [object_layers and scene_layers for object_layers, scene_layers in zip(obj.layers, self.scene.layers)]:
-            obj_visible |= layer_visible
-        return obj_visible
+        with self.session.record(self.sessionRecorder, key, fingerprint) as segment:
+            segment.result = self.yaf_texture.writeTexture(self.scene, tex)
 
     def exportObjects(self):
         self.yi.printInfo("Exporter: Processing Lamps...")
 
+        with self.profiler.section("exportLamps"):
+            self.exportLamps()
+
+        self.yi.printInfo("Exporter: Processing Geometry...")
+
+        # the incremental export session records the calls of every object in order
+        if self.scene.yafaray.export.pipelinedExport and not self.is_preview and self.session is None:
+            self.yaf_object.startPipeline(self.scene.yafaray.export.pipelineQueueSize)
+
+        self.yaf_object.setInstanceChunkSize(self.scene.yafaray.export.instanceChunkSize)
+
+        try:
+            self.exportGeometry()
+            self.yaf_object.flushInstances()
+        finally:
+            self.yaf_object.finishPipeline()
+
+        if self.yaf_object.geometryCache is not None:
+            self.yi.printInfo(self.yaf_object.geometryCache.statistics())
+
+        self.yaf_object.printUVStatistics()
+        self.yaf_object.printMeshDataStatistics()
+        self.yaf_object.printAutoInstanceStatistics()
+        self.yaf_object.printCullingStatistics()
+
+    def exportLamps(self):
         # export only visible lamps
-        for obj in [o for o in self.scene.objects if not o.hide_render and o.is_visible(self.scene) and o.type == 'LAMP']:
+        for obj in self.sceneIndex.lamps:
             if obj.is_duplicator:
                 obj.create_dupli_list(self.scene)
                 for obj_dupli in obj.dupli_list:
@@ -147,35 +296,88 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
             else:
                 if obj.parent and obj.parent.is_duplicator:
                     continue
-                self.yaf_lamp.createLight(self.yi, obj, obj.matrix_world)
+                self.writeLight(obj)
 
-        self.yi.printInfo("Exporter: Processing Geometry...")
+    def writeLight(self, obj):
+        if self.session is None:
+            self.yaf_lamp.createLight(self.yi, obj, obj.matrix_world)
+            return
+
+        key = "LA:" + obj.name
+        fingerprint = yaf_export_session.lampFingerprint(obj)
+        if self.session.check(key, fingerprint) is None:
+            self.session.replay(self.yi, key)
+            return
 
+        with self.session.record(self.sessionRecorder, key, fingerprint):
+            self.yaf_lamp.createLight(self.yi, obj, obj.matrix_world)
+
+    def findAutoInstanceCandidates(self, geometry):
+        # Objects (not sharing their mesh datablock) which may have the same geometry as other objects
+        groups = {}
+        for obj in [o for o, kind in geometry if kind == yaf_scene_index.SINGLE and o.type == 'MESH']:
+            key = self.yaf_object.getInstanceCandidateKey(obj)
+            if key is not None:
+                groups.setdefault(key, []).append(obj.name)
+
+        return {name for names in groups.values() if len(names) > 1 for name in names}
+
+    def exportGeometry(self):
         # export only visible objects
         baseIds = {}
         dupBaseIds = {}
 
-        for obj in [o for o in self.scene.objects if not o.hide_render and (o.is_visible(self.scene) or o.hide) \
-        and self.object_on_visible_layer(o) and (o.type in {'MESH', 'SURFACE', 'CURVE', 'FONT', 'EMPTY'})]:
+        geometry = self.sceneIndex.geometry
+
+        autoInstances = set()
+        if self.scene.yafaray.export.autoInstancing and self.scene.render.use_instances and not self.is_preview:
+            autoInstances = self.findAutoInstanceCandidates(geometry)
+
+        for obj, kind in geometry:
             # Exporting dupliObjects as instances, also check for dupliObject type 'EMPTY' and don't export them as geometry
-            if obj.is_duplicator:
+            if kind == yaf_scene_index.DUPLICATOR:
                 self.yi.printVerbose("Processing duplis for: {0}".format(obj.name))
                 obj.dupli_list_create(self.scene)
 
-                for obj_dupli in [od for od in obj.dupli_list if not od.object.type == 'EMPTY']:
+                if self.scene.render.use_instances:
+                    # all the dupli matrices at once, they are sent in batches per base object
+                    dupliMatrices = yaf_geometry.getDupliMatrices(obj.dupli_list)
+                    dupliInstances = {}
+                    dupliObjects = {}
+
+                # textures and materials once per duplicated object, not once per dupli
+                duplis = [(index, obj_dupli) for index, obj_dupli in enumerate(obj.dupli_list) if obj_dupli.object.type != 'EMPTY']
+                exported = set()
+                for index, obj_dupli in duplis:
+                    if obj_dupli.object.name in exported:
+                        continue
+                    exported.add(obj_dupli.object.name)
+
                     self.exportTexture(obj_dupli.object)
                     for mat_slot in obj_dupli.object.material_slots:
                         if mat_slot.material not in self.materials:
                             self.exportMaterial(mat_slot.material)
 
+                for index, obj_dupli in duplis:
                     if not self.scene.render.use_instances:
                         matrix = obj_dupli.matrix.copy()
-                        self.yaf_object.writeMesh(obj_dupli.object, matrix)
+                        if not self.yaf_object.cullObject(obj_dupli.object, matrix):
+                            self.yaf_object.writeMesh(obj_dupli.object, matrix)
                     else:
-                        if obj_dupli.object.name not in dupBaseIds:
-                            dupBaseIds[obj_dupli.object.name] = self.yaf_object.writeInstanceBase(obj_dupli.object)
-                        matrix = obj_dupli.matrix.copy()
-                        self.yaf_object.writeInstance(dupBaseIds[obj_dupli.object.name], matrix, obj_dupli.object.name)
+                        dupliObjects[obj_dupli.object.name] = obj_dupli.object
+                        dupliInstances.setdefault(obj_dupli.object.name, []).append(index)
+
+                if self.scene.render.use_instances:
+                    for name, indices in dupliInstances.items():
+                        matrices = self.yaf_object.cullInstances(dupliObjects[name], dupliMatrices[indices])
+                        # the base is only needed when some instance is visible, it is
+                        # still recorded so the object isn't exported again on its own
+                        if not len(matrices):
+                            dupBaseIds.setdefault(name, None)
+                            continue
+                        if dupBaseIds.get(name) is None:
+                            dupBaseIds[name] = self.yaf_object.writeInstanceBase(dupliObjects[name])
+                        self.yaf_object.addInstances(dupBaseIds[name], matrices)
 
                 if obj.dupli_list is not None:
                     obj.dupli_list_clear()
@@ -189,11 +391,15 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
                             self.yaf_object.writeMesh(obj, matrix)
 
             # no need to write empty object from here on, so continue with next object in loop
-            elif obj.type == 'EMPTY':
+            elif kind == yaf_scene_index.EMPTY:
+                continue
+
+            # outside the camera view, skipped or replaced by a bounding box proxy
+            elif self.yaf_object.cullObject(obj):
                 continue
 
             # Exporting objects with shared mesh data blocks as instances
-            elif obj.data.users > 1 and self.scene.render.use_instances:
+            elif kind == yaf_scene_index.SHARED_DATA and self.scene.render.use_instances:
                 self.yi.printVerbose("Processing shared mesh data node object: {0}".format(obj.name))
                 if obj.data.name not in baseIds:
                     baseIds[obj.data.name] = self.yaf_object.writeInstanceBase(obj)
@@ -202,23 +408,43 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
                     matrix = obj.matrix_world.copy()
                     self.yaf_object.writeInstance(baseIds[obj.data.name], matrix, obj.data.name)
 
+            # Exporting objects with identical geometry in different mesh data blocks as instances
+            elif obj.name in autoInstances and obj.name not in dupBaseIds:
+                self.yi.printVerbose("Processing automatic instance object: {0}".format(obj.name))
+                self.yaf_object.writeAutoInstance(obj)
+
             elif obj.data.name not in baseIds and obj.name not in dupBaseIds:
-                self.yaf_object.writeObject(obj)
+                self.writeObject(obj)
+
+    def writeObject(self, obj):
+        # Only plain mesh objects are kept in the incremental export session,
+        # instances and particles depend on too many other objects
+        if self.session is None or obj.type != 'MESH' or obj.particle_systems:
+            self.yaf_object.writeObject(obj)
+            return
+
+        key = "OB:" + obj.name
+        fingerprint, volatile = yaf_export_session.objectFingerprint(obj, self.scene.yafaray.export.exportNormals)
+        dependencies = ["MA:" + slot.material.name for slot in obj.material_slots if slot.material]
+        if self.session.check(key, fingerprint, dependencies, volatile) is None:
+            self.session.replay(self.yi, key)
+            return
+
+        with self.session.record(self.sessionRecorder, key, fingerprint, dependencies):
+            self.yaf_object.writeObject(obj)
 
     def handleBlendMat(self, mat):
+            node = self.materialGraph.node(mat)
             blendmat_error = False
-            try:
-                mat1 = bpy.data.materials[mat.material1name]
-            except:
-                self.yi.printWarning("Exporter: Problem with blend material:\"{0}\". Could not find the first material:\"{1}\"".format(mat.name,mat.material1name))
+            for index, name in node.missing:
+                self.yi.printWarning("Exporter: Problem with blend material:\"{0}\". Could not find the {1} material:\"{2}\"".format(mat.name, "first" if index == 1 else "second", name))
                 blendmat_error = True
-            try:
-                mat2 = bpy.data.materials[mat.material2name]
-            except:
-                self.yi.printWarning("Exporter: Problem with blend material:\"{0}\". Could not find the second material:\"{1}\"".format(mat.name,mat.material2name))
+            if node.cycle is not None:
+                self.yi.printWarning("Exporter: Problem with blend material \"{0}\". Blend materials blending each other: {1}".format(mat.name, " -> ".join(node.cycle)))
                 blendmat_error = True
             if blendmat_error:
                 return blendmat_error
+            mat1, mat2 = node.components
             if mat1.name == mat2.name:
                 self.yi.printWarning("Exporter: Problem with blend material \"{0}\". \"{1}\" and \"{2}\" to blend are the same materials".format(mat.name, mat1.name, mat2.name))
 
@@ -229,7 +455,7 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
                     
             elif mat1 not in self.materials:
                 self.materials.add(mat1)
-                self.yaf_material.writeMaterial(mat1, self.scene)
+                self.writeMaterial(mat1)
 
             if mat2.mat_type == 'blend':
                 blendmat_error = self.handleBlendMat(mat2)
@@ -238,11 +464,11 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
                     
             elif mat2 not in self.materials:
                 self.materials.add(mat2)
-                self.yaf_material.writeMaterial(mat2, self.scene)
+                self.writeMaterial(mat2)
 
             if mat not in self.materials:
                 self.materials.add(mat)
-                self.yaf_material.writeMaterial(mat, self.scene)
+                self.writeMaterial(mat)
 
     def exportMaterials(self):
         self.yi.printInfo("Exporter: Processing Materials...")
@@ -260,20 +486,36 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
         ymat = self.yi.createMaterial("defaultMat")
         self.materialMap["default"] = ymat
 
-        for obj in self.scene.objects:
-            for mat_slot in obj.material_slots:
-                if mat_slot.material not in self.materials:
-                    self.exportMaterial(mat_slot.material)
+        for material in self.sceneIndex.materials:
+            if material not in self.materials:
+                self.exportMaterial(material)
 
     def exportMaterial(self, material):
         if material:
-            if material.mat_type == 'blend':
-                # must make sure all materials used by a blend mat
-                # are written before the blend mat itself
-                self.handleBlendMat(material)
-            else:
-                self.materials.add(material)
-                self.yaf_material.writeMaterial(material, self.scene, self.is_preview)
+            with self.profiler.section("exportMaterial", material.name):
+                if material.mat_type == 'blend':
+                    # must make sure all materials used by a blend mat
+                    # are written before the blend mat itself
+                    self.handleBlendMat(material)
+                else:
+                    self.materials.add(material)
+                    self.writeMaterial(material, self.is_preview)
+
+    def writeMaterial(self, mat, preview=False):
+        if self.session is None:
+            self.yaf_material.writeMaterial(mat, self.scene, preview)
+            return
+
+        key = "MA:" + mat.name
+        fingerprint = yaf_export_session.materialFingerprint(mat)
+        dependencies = yaf_export_session.materialDependencies(mat)
+        if self.session.check(key, fingerprint, dependencies) is None:
+            self.materialMap[mat] = self.session.replay(self.yi, key)
+            return
+
+        with self.session.record(self.sessionRecorder, key, fingerprint, dependencies) as segment:
+            self.yaf_material.writeMaterial(mat, self.scene, preview)
+            segment.result = self.sessionRecorder.tapeValue(self.materialMap[mat])
 
     def decideOutputFileName(self, output_path, filetype):
 
@@ -318,11 +560,14 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
     # callback to export the scene
     def update(self, data, scene):
         self.update_stats("", "Setting up render")
+        self.renderStartTime = time.time()
+        self.firstTileTime = None
         if not self.is_preview:
             scene.frame_set(scene.frame_current)
 
         self.scene = scene
         render = scene.render
+        self.profiler = ExportProfiler(scene.yafaray.logging.exportProfiler and not self.is_preview)
 
         if scene.img_save_with_blend_file:
             if bpy.data.filepath == "":
@@ -336,7 +581,10 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
         fp = os.path.realpath(fp)
         fp = os.path.normpath(fp)
 
-        [self.sizeX, self.sizeY, self.bStartX, self.bStartY, self.bsizeX, self.bsizeY, camDummy] = yaf_scene.getRenderCoords(scene)
+        with self.profiler.section("sceneIndex"):
+            self.sceneIndex = yaf_scene_index.SceneIndex(scene)
+
+        [self.sizeX, self.sizeY, self.bStartX, self.bStartY, self.bsizeX, self.bsizeY, camDummy] = yaf_scene.getRenderCoords(scene, self.sceneIndex)
 
         if render.use_border:
             self.resX = self.bsizeX
@@ -345,8 +593,54 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
             self.resX = self.sizeX
             self.resY = self.sizeY
 
+        self.session = None
+        if scene.yafaray.export.incrementalExport and not self.is_preview:
+            self.session = yaf_export_session.exportSession
+        elif not self.is_preview:
+            yaf_export_session.exportSession.clear()  # don't keep the recorded calls
+
+        self.callTapeKey, callTapeNote = self.getCallTapeKey(scene)
+        tape = self.loadCallTape()
+        self.recordCallTape = self.callTapeKey is not None and tape is None
+        with self.profiler.section("setupInterface"):
+            self.setupInterface(scene, fp)
+        if callTapeNote:
+            self.yi.printInfo("Exporter: Call tape not used: {0}".format(callTapeNote))
+
+        if tape is not None and not self.replayCallTape(tape):
+            # the interface already got part of the tape, start again with a normal export
+            self.releaseInterface()
+            tape = None
+            self.recordCallTape = True
+            self.setupInterface(scene, fp)
+
+        if tape is None:
+            if self.recordCallTape:
+                self.tapeRecorder.start()
+            if self.session is not None:
+                self.beginSession()
+
+            with self.profiler.section("exportScene"):
+                self.exportScene()
+            with self.profiler.section("exportIntegrators"):
+                self.yaf_integrator.exportIntegrator(self.scene)
+                self.yaf_integrator.exportVolumeIntegrator(self.scene)
+
+            # must be called last as the params from here will be used by render()
+            yaf_scene.exportRenderSettings(self.yi, self.scene, self.sceneIndex)
+
+            if self.session is not None:
+                self.finishSession()
+            if self.recordCallTape:
+                self.saveCallTape()
+
+        self.writeProfile(fp)
+
+    def setupInterface(self, scene, fp):
+        render = scene.render
+
         if scene.gs_type_render == "file":
-            self.setInterface(yafaray_v3_interface.yafrayInterface_t())
+            self.setInterface(*self.acquireInterface())
             self.yi.startScene()
             yaf_scene.exportRenderPassesSettings(self.yi, self.scene)
             self.yi.setupRenderPasses()
@@ -371,6 +665,7 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
                 yafaray_presets.YAF_AddPresetBase.export_to_file(yafaray_presets.YAFARAY_OT_presets_renderset, self.outputFile)
 
         elif scene.gs_type_render == "xml":
+            self.pooledInterface = None
             self.setInterface(yafaray_v3_interface.xmlInterface_t())
             self.outputFile, self.output, self.file_type = self.decideOutputFileName(fp, 'XML')
             self.yi.setOutfile(self.outputFile)
@@ -401,7 +696,7 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
             self.co = yafaray_v3_interface.imageOutput_t()
 
         else:
-            self.setInterface(yafaray_v3_interface.yafrayInterface_t())
+            self.setInterface(*self.acquireInterface())
             self.yi.startScene()
             yaf_scene.exportRenderPassesSettings(self.yi, self.scene)
             self.yi.setupRenderPasses()
@@ -425,16 +720,10 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
                 self.ih = self.yi.createImageHandler("outFile")
                 self.co = yafaray_v3_interface.imageOutput_t(self.ih, str(self.outputFile), 0, 0)
                 self.yi.setOutput2(self.co)
+                self.pooledInterface = None  # the Core keeps the secondary output, don't reuse the interface
                 if scene.yafaray.logging.savePreset:
                     yafaray_presets.YAF_AddPresetBase.export_to_file(yafaray_presets.YAFARAY_OT_presets_renderset, self.outputFile)
 
-        self.exportScene()
-        self.yaf_integrator.exportIntegrator(self.scene)
-        self.yaf_integrator.exportVolumeIntegrator(self.scene)
-
-        # must be called last as the params from here will be used by render()
-        yaf_scene.exportRenderSettings(self.yi, self.scene)
-
     # callback to render scene
     def render(self, scene):
         self.bl_use_postprocess = False
@@ -472,8 +761,15 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
                     # Now, Blender use same range to YafaRay
                     self.update_progress(self.prog)
 
+            def noteFirstTile():
+                # startup to first tile latency, see the interface pool
+                if self.firstTileTime is None:
+                    self.firstTileTime = time.time()
+                    self.yi.printInfo("Exporter: First tile {0:.3f} s after the render start".format(self.firstTileTime - self.renderStartTime))
+
             def drawAreaCallback(*args):
                 x, y, w, h, view_number, tiles = args
+                noteFirstTile()
                 res = self.begin_result(x, y, w, h)
 
                 try:
@@ -512,6 +808,7 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
 
             def flushCallback(*args):
                 w, h, view_number, tiles = args
+                noteFirstTile()
                 res = self.begin_result(0, 0, w, h)
 
                 try:
@@ -571,7 +868,6 @@ class YafaRayRenderEngine(bpy.types.RenderEngine):
                 self.yi.abort()
                 t.join()
 
-        self.yi.clearAll()
-        del self.yi
+        self.releaseInterface()
         self.update_stats("", "Done!")
         self.bl_use_postprocess = True
@@ -0,0 +1,365 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Incremental export session, kept between renders of the same Blender
+# session. YafaRay Core can't update single items of a scene, its interface
+# is cleared after every render and the whole scene has to be sent again.
+# What can be saved is the work on the Python side: the interface calls made
+# to export every texture, material, lamp and mesh object are kept together
+# with a fingerprint of the datablock. In the next render the datablocks
+# whose fingerprint and dependencies (material -> textures, blend material ->
+# its materials, object -> materials) didn't change are sent again by
+# replaying their calls, only the changed ones are exported from bpy.
+
+import os
+from contextlib import contextmanager
+import bpy
+import numpy as np
+from . import yaf_call_tape
+from .yaf_geometry_cache import bufferCRC, rnaFingerprint
+
+# Properties changing without any change to the exported data
+IGNORED_PROPERTIES = {"is_updated", "is_updated_data", "users", "use_fake_user", "tag", "select",
+                      "active_material_index", "active_texture_index", "active_texture"}
+
+# Modifiers giving another result in every frame with the same settings
+TIME_DEPENDENT_MODIFIERS = {'CLOTH', 'SOFT_BODY', 'WAVE', 'BUILD', 'OCEAN', 'EXPLODE', 'FLUID_SIMULATION',
+                            'DYNAMIC_PAINT', 'SMOKE', 'MESH_CACHE', 'MESH_SEQUENCE_CACHE'}
+
+# Arguments holding an object ID returned by getNextFreeID
+ID_ARGUMENTS = {"startTriMesh": 0, "startCurveMesh": 0, "addInstance": 0, "addInstances": 0}
+
+
+class NamedHandle(object):
+    # Object returned by a create* call, found again by the name it was created with
+    def __init__(self, method, name):
+        self.key = (method, name)
+
+
+class IDRef(object):
+    # n-th object ID got with getNextFreeID in a segment
+    def __init__(self, index):
+        self.index = index
+
+
+class Segment(object):
+    # Calls made to export one datablock
+    def __init__(self, fingerprint, dependencies):
+        self.fingerprint = fingerprint
+        self.dependencies = dependencies
+        self.calls = []
+        self.ids = {}  # ID -> IDRef, only while recording
+        self.created = set()  # handles created by the segment
+        self.handles = set()  # handles created by other segments or outside of them
+        self.result = None
+        self.invalid = None
+        self.size = 0
+
+
+class SessionRecorder(yaf_call_tape.TapeRecorder):
+    # Keeps the calls of the datablock being exported in its segment. Handles
+    # returned by create* calls are registered by name in the session for the
+    # whole export, also outside of the segments (defaultMat...), so the
+    # replayed segments can find the handles they use in the new interface.
+    def __init__(self, yi, session):
+        super(SessionRecorder, self).__init__(yi)
+        self.session = session
+        self.segment = None
+
+    def record(self, name, tapeArgs, result):
+        segment = self.segment
+        if yaf_call_tape.isHandle(result):
+            if name.startswith("create") and tapeArgs and isinstance(tapeArgs[0], str):
+                handle = NamedHandle(name, tapeArgs[0])
+                self.session.handles[handle.key] = result
+                self.handles[id(result)] = (handle, result)
+                if segment is not None:
+                    segment.created.add(handle.key)
+            elif segment is not None:
+                self.unsupported(result)
+
+        if segment is None:
+            return
+
+        usedHandles(tapeArgs, segment)
+        if name == "getNextFreeID":
+            segment.ids[result] = IDRef(len(segment.ids))
+        else:
+            position = 1 if name == "paramsSetInt" and tapeArgs[0] == "object" else ID_ARGUMENTS.get(name)
+            if position is not None and isinstance(tapeArgs[position], int) and tapeArgs[position] in segment.ids:
+                tapeArgs[position] = segment.ids[tapeArgs[position]]
+        segment.calls.append((name, tapeArgs))
+
+    def unsupported(self, value):
+        if self.segment is not None and self.segment.invalid is None:
+            self.segment.invalid = "argument of type {0}".format(type(value).__name__)
+
+
+def usedHandles(values, segment):
+    for value in values:
+        if isinstance(value, NamedHandle) and value.key not in segment.created:
+            segment.handles.add(value.key)
+        elif isinstance(value, list):
+            usedHandles(value, segment)
+
+
+def valueSize(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    elif isinstance(value, list):
+        return sum(valueSize(item) for item in value)
+    return 8
+
+
+class ExportSession(object):
+    def __init__(self):
+        self.segments = {}  # "MA:name"... -> Segment
+        self.settings = None
+        self.handles = {}  # (create method, name) -> handle in the current interface
+        self.dirty = {}  # key -> why it is exported again in this render
+        self.used = set()
+        self.reused = 0
+
+    def clear(self):
+        self.segments = {}
+        self.settings = None
+        self.handles = {}
+
+    def begin(self, settings):
+        # Returns why everything is exported again, if so
+        self.handles = {}
+        self.dirty = {}
+        self.used = set()
+        self.reused = 0
+
+        reason = None
+        if settings != self.settings:
+            if self.settings is not None:
+                reason = "render settings or camera changed"
+            self.segments = {}
+            self.settings = settings
+        return reason
+
+    def check(self, key, fingerprint, dependencies=(), volatile=None):
+        # None when the recorded segment can be replayed, otherwise why not
+        self.used.add(key)
+        segment = self.segments.get(key)
+        if volatile is not None:
+            reason = volatile
+        elif segment is None:
+            reason = "new"
+        else:
+            reason = None
+            changed = [part for part in fingerprint if fingerprint[part] != segment.fingerprint.get(part)]
+            dirtyDependencies = [dependency for dependency in dependencies if dependency in self.dirty]
+            missing = [handle for handle in segment.handles if handle not in self.handles]
+            if changed:
+                reason = "changed " + ", ".join(sorted(changed))
+            elif dirtyDependencies:
+                reason = "depends on " + ", ".join(dirtyDependencies)
+            elif tuple(dependencies) != segment.dependencies:
+                reason = "dependencies changed"
+            elif missing:
+                reason = "needs {0} \"{1}\" which was not exported".format(*missing[0])
+
+        if reason is not None:
+            self.dirty[key] = reason
+        return reason
+
+    def replay(self, yi, key):
+        # Returns the result the segment was recorded with, with the handles of the current interface
+        segment = self.segments[key]
+        ids = []
+        for name, args in segment.calls:
+            floatArrays = []
+            args = [self.resolve(arg, yi, ids, floatArrays) for arg in args]
+            try:
+                result = getattr(yi, name)(*args)
+            finally:
+                for array in floatArrays:
+                    yaf_call_tape.yafaray_v3_interface.delete_floatArray(array)
+            if name == "getNextFreeID":
+                ids.append(result)
+
+        self.reused += 1
+        return self.resolve(segment.result, yi, ids, [])
+
+    def resolve(self, value, yi, ids, floatArrays):
+        if isinstance(value, NamedHandle):
+            return self.handles[value.key]
+        elif isinstance(value, IDRef):
+            return ids[value.index]
+        elif isinstance(value, list):
+            return [self.resolve(item, yi, ids, floatArrays) for item in value]
+        return yaf_call_tape.resolveValue(value, yi, {}, floatArrays)
+
+    @contextmanager
+    def record(self, recorder, key, fingerprint, dependencies=()):
+        # Records the calls made in the with block, the segment is only kept
+        # when the datablock can be fingerprinted and all the calls can be replayed
+        segment = Segment(fingerprint, tuple(dependencies))
+        recorder.segment = segment
+        try:
+            yield segment
+        finally:
+            recorder.segment = None
+
+        segment.ids = {}
+        if fingerprint is not None and segment.invalid is None:
+            segment.size = sum(valueSize(arg) for name, args in segment.calls for arg in args)
+            self.segments[key] = segment
+        else:
+            self.segments.pop(key, None)
+            if segment.invalid is not None:
+                self.dirty[key] = "{0}, not kept: {1}".format(self.dirty.get(key, "new"), segment.invalid)
+
+    def finish(self):
+        # Drops what was not exported in this render, returns the report lines
+        dropped = [key for key in self.segments if key not in self.used]
+        for key in dropped:
+            del self.segments[key]
+        self.handles = {}
+
+        new = sum(1 for reason in self.dirty.values() if reason == "new")
+        size = sum(segment.size for segment in self.segments.values())
+        lines = ["Exporter: Incremental export: {0} datablocks reused, {1} exported again, {2} new, {3} dropped, {4:.1f} MB kept".format(
+            self.reused, len(self.dirty) - new, new, len(dropped), size / 1048576.0)]
+        for key, reason in sorted(self.dirty.items()):
+            if reason != "new":
+                lines.append("Exporter: Incremental export: {0}: {1}".format(key, reason))
+        return lines
+
+
+def matrixFingerprint(matrix):
+    return tuple(tuple(row) for row in matrix)
+
+
+def settingsFingerprint(scene):
+    # Everything any exported datablock may depend on: export options, clay
+    # render, resolution and, only when culling or level of detail use it,
+    # the camera. The camera itself is not kept in the session, it is
+    # exported again for every render.
+    render = scene.render
+    export = scene.yafaray.export
+    settings = [rnaFingerprint(export), render.resolution_x, render.resolution_y,
+                render.resolution_percentage, render.use_instances, scene.gs_clay_render,
+                tuple(scene.gs_clay_col), scene.gs_clay_render_keep_transparency]
+    camera = scene.camera
+    usesCamera = export.frustumCulling or export.screenSizeLOD or any(mat.strand_lod_camera for mat in bpy.data.materials)
+    if camera is not None and usesCamera:
+        settings += [camera.name, matrixFingerprint(camera.matrix_world), rnaFingerprint(camera.data, IGNORED_PROPERTIES)]
+    return tuple(settings)
+
+
+def textureFingerprint(tex, frame):
+    # (fingerprint, why it can't be kept), packed images are extracted to a folder per frame
+    parts = {"properties": rnaFingerprint(tex, IGNORED_PROPERTIES)}
+    if getattr(tex, "use_color_ramp", False):
+        parts["color ramp"] = (rnaFingerprint(tex.color_ramp),
+                               tuple((tuple(e.color), e.position) for e in tex.color_ramp.elements))
+
+    image = getattr(tex, "image", None)
+    if image is not None:
+        if image.source != 'FILE' or image.is_dirty:
+            return None, "image {0} is {1}".format(image.name, "modified" if image.is_dirty else image.source.lower())
+        path = bpy.path.abspath(image.filepath, library=image.library)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        parts["image"] = (path, frame if image.packed_file else None, image.colorspace_settings.name, mtime)
+
+    return parts, None
+
+
+def materialFingerprint(mat):
+    slots = []
+    for slot in mat.texture_slots:
+        if slot is None:
+            slots.append(None)
+            continue
+        mapObject = slot.object
+        slots.append((rnaFingerprint(slot), matrixFingerprint(mapObject.matrix_world) if mapObject else None))
+
+    # the handle name includes the hash of the datablock, see yafMaterial.namehash
+    return {"properties": rnaFingerprint(mat, IGNORED_PROPERTIES), "texture slots": tuple(slots), "identity": mat.__hash__()}
+
+
+def materialDependencies(mat):
+    dependencies = ["TE:" + slot.texture.name for slot in mat.texture_slots if slot and slot.texture and slot.use]
+    if mat.mat_type == 'blend':
+        dependencies += ["MA:" + mat.material1name, "MA:" + mat.material2name]
+    return dependencies
+
+
+def lampFingerprint(obj):
+    return {"transform": matrixFingerprint(obj.matrix_world),
+            "properties": rnaFingerprint(obj, IGNORED_PROPERTIES),
+            "lamp data": rnaFingerprint(obj.data, IGNORED_PROPERTIES)}
+
+
+def meshFingerprint(mesh):
+    crcs = [bufferCRC(mesh.vertices, "co", np.float32, 3),
+            bufferCRC(mesh.loops, "vertex_index", np.int32),
+            bufferCRC(mesh.polygons, "loop_total", np.int32),
+            bufferCRC(mesh.polygons, "material_index", np.int32),
+            bufferCRC(mesh.polygons, "use_smooth", np.bool_)]
+    for layer in mesh.uv_layers:
+        crcs.append((layer.name, bufferCRC(layer.data, "uv", np.float32, 2)))
+
+    shapeKeys = mesh.shape_keys
+    if shapeKeys is not None:
+        for block in shapeKeys.key_blocks:
+            crcs.append((block.name, block.value, block.mute, bufferCRC(block.data, "co", np.float32, 3)))
+
+    return (rnaFingerprint(mesh, IGNORED_PROPERTIES), tuple(crcs))
+
+
+def objectFingerprint(obj, exportNormals):
+    # (fingerprint, why it can't be kept). Objects whose geometry depends
+    # on other objects (modifiers pointing to them, deforming parents) or on
+    # the frame (simulations, caches) are always exported again, their
+    # changes can't be seen from here.
+    mesh = obj.data
+    if mesh.is_editmode:
+        return None, "in edit mode"
+    if obj.parent is not None and obj.parent_type in {'ARMATURE', 'LATTICE', 'VERTEX', 'VERTEX_3'}:
+        return None, "deformed by its parent {0}".format(obj.parent.name)
+    if exportNormals and mesh.has_custom_normals:
+        return None, "custom normals"
+
+    modifiers = []
+    for modifier in obj.modifiers:
+        if modifier.type in TIME_DEPENDENT_MODIFIERS:
+            return None, "modifier {0} is time dependent".format(modifier.name)
+        for prop in modifier.bl_rna.properties:
+            if prop.type == 'POINTER' and isinstance(getattr(modifier, prop.identifier), bpy.types.Object):
+                return None, "modifier {0} uses another object".format(modifier.name)
+        modifiers.append(rnaFingerprint(modifier))
+
+    parts = {"transform": matrixFingerprint(obj.matrix_world),
+             "properties": rnaFingerprint(obj, IGNORED_PROPERTIES),
+             "modifiers": tuple(modifiers),
+             "mesh data": meshFingerprint(mesh),
+             "materials": tuple(slot.material.name if slot.material else None for slot in obj.material_slots)}
+    return parts, None
+
+
+exportSession = ExportSession()
@@ -0,0 +1,581 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Array helpers for the geometry export. Everything in here works on plain
+# NumPy buffers filled with foreach_get, so whole meshes can be handed to the
+# interface in a few calls instead of one SWIG call per vertex/face.
+
+import hashlib
+import math
+import numpy as np
+
+
+def hasBulkInterface(yi):
+    # Bulk entry points are only available in newer YafaRay Core builds,
+    # older ones still need the per vertex/face calls
+    return hasattr(yi, "addVertexArray") and hasattr(yi, "addUVArray") and hasattr(yi, "addTriangleArray")
+
+
+def getDupliMatrices(dupli_list):
+    # RNA matrices are stored column major, transpose them into the row major
+    # order used by mathutils and the YafaRay matrix4x4_t
+    matrices = np.empty(len(dupli_list) * 16, dtype=np.float32)
+    dupli_list.foreach_get("matrix", matrices)
+    return matrices.reshape(-1, 4, 4).transpose(0, 2, 1).reshape(-1, 16)
+
+
+def getHairKeys(particles):
+    # Number of hair keys of every particle and the coordinates of all of them
+    # in one buffer, strand after strand. One foreach_get per particle instead
+    # of one Python access per key.
+    counts = np.fromiter((len(particle.hair_keys) for particle in particles), dtype=np.int32, count=len(particles))
+    co = np.empty(int(counts.sum()) * 3, dtype=np.float32)
+    end = 0
+    for particle, count in zip(particles, counts.tolist()):
+        start, end = end, end + count * 3
+        particle.hair_keys.foreach_get("co", co[start:end])
+    return counts, co.reshape(-1, 3)
+
+
+def getParticleVisibility(particles):
+    exist = np.empty(len(particles), dtype=np.bool_)
+    particles.foreach_get("is_exist", exist)
+    visible = np.empty(len(particles), dtype=np.bool_)
+    particles.foreach_get("is_visible", visible)
+    return exist & visible
+
+
+def thinStrands(counts, co, visible, density):
+    # Keep an evenly spread fraction (density) of the strands. The same
+    # strands are kept in every frame, so thinned hair doesn't flicker.
+    index = np.arange(len(counts))
+    keep = np.floor((index + 1) * density) > np.floor(index * density)
+    keyKeep = np.repeat(keep, counts)
+    return counts[keep], co[keyKeep], visible[keep]
+
+
+def simplifyStrands(counts, co, maxAngle):
+    # Drop the inner hair keys where the strand bends less than maxAngle
+    # (radians). The angle is measured again after every pass against the
+    # keys still left, and no two neighbouring keys are dropped in the same
+    # pass, so the error doesn't add up along slowly bending strands. Roots
+    # and tips are always kept.
+    keyStrand = np.repeat(np.arange(len(counts)), counts)
+    keep = np.ones(len(co), dtype=np.bool_)
+    minCos = math.cos(maxAngle)
+    parity = 0
+    while True:
+        kept = np.flatnonzero(keep)
+        if len(kept) < 3:
+            break
+
+        strand = keyStrand[kept]
+        inner = (strand[1:-1] == strand[:-2]) & (strand[1:-1] == strand[2:])
+        a = co[kept[1:-1]] - co[kept[:-2]]
+        b = co[kept[2:]] - co[kept[1:-1]]
+        lengths = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+        dots = np.einsum("ij,ij->i", a, b)
+        # zero length segments never bend
+        straight = dots >= minCos * lengths
+        candidates = inner & straight
+        if not candidates.any():
+            break
+
+        position = np.arange(len(candidates)) % 2
+        drop = candidates & (position == parity)
+        if not drop.any():
+            drop = candidates & (position != parity)
+        parity = 1 - parity
+        keep[kept[1:-1][drop]] = False
+
+    counts = np.bincount(keyStrand[keep], minlength=len(counts)).astype(np.int32)
+    return counts, co[keep]
+
+
+def strandChunks(counts, chunkSize):
+    # (first strand, last strand + 1, first key, last key + 1) of every chunk
+    # of at most chunkSize strands
+    offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+    for start in range(0, len(counts), chunkSize):
+        end = min(start + chunkSize, len(counts))
+        yield start, end, int(offsets[start]), int(offsets[end])
+
+
+def getVertexBuffer(mesh):
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+
+def transformBuffer(co, matrix):
+    # Apply a 4x4 mathutils matrix to all the vertices at once
+    m = np.array(matrix, dtype=np.float64)
+    return (np.dot(co, m[:3, :3].T) + m[:3, 3]).astype(np.float32)
+
+
+def transformedBounds(corners, matrix):
+    # World space bounding box of a box given by its corners, such as
+    # Object.bound_box. Returns the low and the up corner.
+    co = transformBuffer(np.array([tuple(corner) for corner in corners], dtype=np.float32), matrix)
+    return co.min(axis=0), co.max(axis=0)
+
+
+def transformNormals(normals, matrix):
+    # Normals are transformed with the inverse transpose of the 3x3 part of the
+    # matrix. None for objects scaled to 0 on an axis, their normals are undefined.
+    m = np.array(matrix, dtype=np.float64)[:3, :3]
+    if abs(np.linalg.det(m)) < 1e-12:
+        return None
+    normals = np.dot(normals, np.linalg.inv(m))
+    lengths = np.linalg.norm(normals, axis=-1, keepdims=True)
+    lengths[lengths == 0.0] = 1.0
+    return (normals / lengths).astype(np.float32)
+
+
+def transformCorners(corners, matrices):
+    # Object space points (k, 3) placed with every instance matrix (n, 16), gives (n, k, 3)
+    m = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    return np.einsum("nij,kj->nki", m[:, :3, :3], corners) + m[:, np.newaxis, :3, 3]
+
+
+def getTriangleCount(mesh):
+    # Number of triangles of the polygons, without evaluating the mesh
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    return int(loop_total.sum()) - 2 * len(loop_total)
+
+
+# Triangles of a box made with the corners in the order of Object.bound_box
+BOX_TRIANGLES = np.array([
+    [0, 1, 2], [0, 2, 3],  # -X
+    [4, 7, 6], [4, 6, 5],  # +X
+    [0, 4, 5], [0, 5, 1],  # -Y
+    [3, 2, 6], [3, 6, 7],  # +Y
+    [0, 3, 7], [0, 7, 4],  # -Z
+    [1, 5, 6], [1, 6, 2],  # +Z
+], dtype=np.int32)
+
+
+class MeshTriangles(object):
+    # Triangulated mesh ready for submission, shared by the bulk and the per call export
+    def __init__(self, tris, matIndex, smooth, uv=None, uvCorners=None, normals=None):
+        self.tris = tris  # (n, 3) vertex indices
+        self.matIndex = matIndex  # (n,) Blender material index of every triangle
+        self.smooth = smooth  # (n,) smooth shading flag of every triangle
+        self.uv = uv  # (m, 2) UV of every face corner or None
+        self.uvCorners = uvCorners  # (n, 3) index into uv of every triangle corner
+        self.normals = normals  # (n, 3, 3) normal of every triangle corner until the vertices are split
+
+
+class FaceBuffers(object):
+    # Plain copy of the faces of an evaluated mesh, either tessfaces (4 vertex
+    # indices per face, 4th one 0 for triangles) or loop triangles
+    def __init__(self, verts, matIndex, smooth, uv=None, loops=None, normals=None):
+        self.verts = verts  # (n, 4) for tessfaces, (n, 3) for loop triangles
+        self.matIndex = matIndex
+        self.smooth = smooth
+        self.uv = uv  # (n, 4, 2) per tessface corner or (loops, 2) per loop
+        self.loops = loops  # (n, 3) loop indices of the loop triangles
+        self.normals = normals  # split normals, (n, 4, 3) per tessface corner or (loops, 3) per loop
+
+
+def boxFaces():
+    # Loop triangle style faces of a bounding box proxy
+    numTris = len(BOX_TRIANGLES)
+    return FaceBuffers(BOX_TRIANGLES.copy(), np.zeros(numTris, dtype=np.int32), np.zeros(numTris, dtype=np.bool_))
+
+
+def getFaceBuffers(faces):
+    # vertices_raw always has 4 entries per tessface, the 4th one is 0 for triangles
+    num_faces = len(faces)
+    verts = np.empty(num_faces * 4, dtype=np.int32)
+    faces.foreach_get("vertices_raw", verts)
+    mat_index = np.empty(num_faces, dtype=np.int32)
+    faces.foreach_get("material_index", mat_index)
+    smooth = np.empty(num_faces, dtype=np.bool_)
+    faces.foreach_get("use_smooth", smooth)
+    return verts.reshape(-1, 4), mat_index, smooth
+
+
+def getFaceUVBuffer(uv_layer):
+    # uv_raw always has 4 (u, v) pairs per tessface
+    uv = np.empty(len(uv_layer.data) * 8, dtype=np.float32)
+    uv_layer.data.foreach_get("uv_raw", uv)
+    return uv.reshape(-1, 4, 2)
+
+
+def getTessFaceNormals(faces):
+    # split_normals always has 4 normals per tessface, they must have been
+    # calculated with calc_normals_split before the tessfaces
+    normals = np.empty(len(faces) * 12, dtype=np.float32)
+    faces.foreach_get("split_normals", normals)
+    return normals.reshape(-1, 4, 3)
+
+
+def getLoopNormals(mesh):
+    # calc_normals_split must have been called
+    normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+    mesh.loops.foreach_get("normal", normals)
+    return normals.reshape(-1, 3)
+
+
+def readTessFaces(faces, uv_layer=None):
+    verts, matIndex, smooth = getFaceBuffers(faces)
+    uv = None
+    if uv_layer is not None:
+        uv = getFaceUVBuffer(uv_layer)
+
+    return FaceBuffers(verts, matIndex, smooth, uv)
+
+
+def readLoopTriangles(mesh, uv_layer=None):
+    # Blender versions with loop triangles already give us triangulated ngons
+    num_tris = len(mesh.loop_triangles)
+    tris = np.empty(num_tris * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tris)
+    matIndex = np.empty(num_tris, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("material_index", matIndex)
+    smooth = np.empty(num_tris, dtype=np.bool_)
+    mesh.loop_triangles.foreach_get("use_smooth", smooth)
+    uv = None
+    loops = None
+    if uv_layer is not None:
+        loops = np.empty(num_tris * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get("loops", loops)
+        loops = loops.reshape(-1, 3)
+        uv = np.empty(len(uv_layer.data) * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", uv)
+        uv = uv.reshape(-1, 2)
+
+    return FaceBuffers(tris.reshape(-1, 3), matIndex, smooth, uv, loops)
+
+
+def splitQuads(verts):
+    # Split every quad (v0, v1, v2, v3) into (v0, v1, v2) and (v0, v2, v3),
+    # the same way the per face export does. Returns the triangles and the
+    # face each one comes from.
+    quads = np.flatnonzero(verts[:, 3] != 0)
+    tris = np.concatenate((verts[:, :3], verts[quads][:, [0, 2, 3]]))
+    tri_faces = np.concatenate((np.arange(len(verts), dtype=np.int32), quads.astype(np.int32)))
+    return np.ascontiguousarray(tris, dtype=np.int32), tri_faces
+
+
+def splitQuadCorners(corners, verts):
+    # Same split as splitQuads but for per face corner data such as uv_raw
+    quads = np.flatnonzero(verts[:, 3] != 0)
+    return np.concatenate((corners[:, :3], corners[quads][:, [0, 2, 3]]))
+
+
+def faceCornerUVs(uv, verts):
+    # UVs of the tessface corners, 3 for triangles and 4 for quads like the
+    # per face export sends them, and the index of the UV of every corner of
+    # the triangles splitQuads makes
+    corners = np.ones(verts.shape, dtype=np.bool_)
+    corners[:, 3] = verts[:, 3] != 0
+    table = np.ascontiguousarray(uv.reshape(-1, 2)[corners.ravel()])
+    index = (np.cumsum(corners.ravel(), dtype=np.int32) - 1).reshape(-1, 4)
+    return table, np.ascontiguousarray(splitQuadCorners(index, verts), dtype=np.int32)
+
+
+def triangulateFaces(faces):
+    if faces.loops is None and faces.verts.shape[1] == 4:
+        # Tessfaces are triangles or quads (ngons are already split by Blender)
+        tris, triFaces = splitQuads(faces.verts)
+        uv = uvCorners = None
+        if faces.uv is not None:
+            uv, uvCorners = faceCornerUVs(faces.uv, faces.verts)
+        normals = None
+        if faces.normals is not None:
+            normals = splitQuadCorners(faces.normals, faces.verts)
+
+        return MeshTriangles(tris, faces.matIndex[triFaces], faces.smooth[triFaces], uv, uvCorners, normals)
+
+    # loop triangles share the UVs of their loops
+    uv = uvCorners = None
+    if faces.uv is not None:
+        uv = faces.uv
+        uvCorners = np.ascontiguousarray(faces.loops, dtype=np.int32)
+    normals = None
+    if faces.normals is not None:
+        normals = faces.normals[faces.loops]
+
+    return MeshTriangles(faces.verts, faces.matIndex, faces.smooth, uv, uvCorners, normals)
+
+
+def degenerateTriangles(co, tris, tolerance=1e-7):
+    # Triangles using a vertex twice or with (almost) zero area. The area is
+    # compared with the squared edge lengths, so the test doesn't depend on
+    # the size of the object.
+    repeated = (tris[:, 0] == tris[:, 1]) | (tris[:, 1] == tris[:, 2]) | (tris[:, 0] == tris[:, 2])
+    v0 = co[tris[:, 0]].astype(np.float64)
+    e1 = co[tris[:, 1]] - v0
+    e2 = co[tris[:, 2]] - v0
+    area = np.linalg.norm(np.cross(e1, e2), axis=1)
+    scale = np.einsum("ij,ij->i", e1, e1) + np.einsum("ij,ij->i", e2, e2)
+    return repeated | (area <= tolerance * scale)
+
+
+def unusedVertices(numVertices, tris):
+    # Returns the vertices used by the triangles and the triangles indexing them
+    used = np.zeros(numVertices, dtype=np.bool_)
+    used[tris.ravel()] = True
+    remap = np.cumsum(used, dtype=np.int32) - 1
+    return used, remap[tris]
+
+
+def spreadBits(x):
+    # Insert two zero bits between each of the lower 10 bits of x
+    x = x.astype(np.uint32) & 0x3ff
+    x = (x | (x << 16)) & 0x030000ff
+    x = (x | (x << 8)) & 0x0300f00f
+    x = (x | (x << 4)) & 0x030c30c3
+    x = (x | (x << 2)) & 0x09249249
+    return x
+
+
+def mortonOrder(co, tris):
+    # Order of the triangles along the Z-order curve of their centroids, with
+    # 10 bits per axis inside the bounding box of the mesh
+    centroids = co[tris].mean(axis=1)
+    low = centroids.min(axis=0)
+    size = centroids.max(axis=0) - low
+    size[size == 0.0] = 1.0
+    cells = np.clip(((centroids - low) / size * 1023.0).astype(np.int64), 0, 1023)
+    codes = spreadBits(cells[:, 0]) | (spreadBits(cells[:, 1]) << 1) | (spreadBits(cells[:, 2]) << 2)
+    return np.argsort(codes, kind="mergesort")
+
+
+def firstUseOrder(numVertices, tris):
+    # Vertices in the order the triangles first use them (unused ones at the
+    # end) and the triangles indexing the reordered vertices
+    corners = tris.ravel()
+    firstUse = np.full(numVertices, len(corners), dtype=np.int64)
+    np.minimum.at(firstUse, corners, np.arange(len(corners)))
+    order = np.argsort(firstUse, kind="mergesort")
+    remap = np.empty(numVertices, dtype=np.int32)
+    remap[order] = np.arange(numVertices, dtype=np.int32)
+    return order, remap[tris]
+
+
+def splitNormals(tris, normals):
+    # One vertex for every different (vertex, normal) pair of the triangle
+    # corners, vertices keep the order they are first used in. Returns the
+    # original vertex and the normal of every new vertex and the new triangles.
+    vertices = tris.reshape(-1).astype(np.int32)
+    normals = np.ascontiguousarray(normals.reshape(-1, 3), dtype=np.float32) + np.float32(0.0)
+    keys = np.empty((len(vertices), 4), dtype=np.int32)
+    keys[:, 0] = vertices
+    keys[:, 1:] = normals.view(np.int32)
+    unused, first, inverse = np.unique(keys.view(np.dtype((np.void, 16))).ravel(), return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="mergesort")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    first = first[order]
+    return vertices[first], np.ascontiguousarray(normals[first]), rank[inverse.ravel()].astype(np.int32).reshape(-1, 3)
+
+
+def mapMaterialIndices(matIndex, num_slots):
+    # Blender material indices of every triangle -> index into the material table
+    return np.clip(matIndex, 0, max(num_slots - 1, 0)).astype(np.int32)
+
+
+def cornerUVs(uv, uvCorners):
+    # One UV per face corner, the way they come from Blender. Corners of
+    # removed triangles are dropped.
+    used, inverse = np.unique(uvCorners, return_inverse=True)
+    return np.ascontiguousarray(uv[used]), inverse.astype(np.int32).reshape(-1, 3)
+
+
+def indexUVs(uv, uvTris):
+    # Deduplicate the (u, v) pairs of the face corners given by cornerUVs.
+    # Returns the table of unique UVs and the index of the UV of every
+    # triangle corner. Rows are compared as raw bytes, adding 0.0 turns -0.0
+    # into 0.0 first.
+    table = np.ascontiguousarray(uv, dtype=np.float32) + np.float32(0.0)
+    keys = table.view(np.dtype((np.void, table.dtype.itemsize * 2))).ravel()
+    unused, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return np.ascontiguousarray(table[first]), inverse.astype(np.int32)[uvTris]
+
+
+def orcoBuffer(co, bbMin, bbMax):
+    # Bring the untransformed vertices into a (-1 -1 -1) (1 1 1) bounding box.
+    # Done in place on a single float32 copy, ready for addVertexArray.
+    bbMin = np.asarray(bbMin, dtype=np.float32)
+    delta = np.asarray(bbMax, dtype=np.float32) - bbMin
+    delta[delta < 0.0001] = 1
+    orco = co - bbMin
+    orco *= 2 / delta
+    orco -= 1
+    return orco
+
+
+def geometryContentKey(job):
+    # Key of the evaluated (object space) geometry of a job that hasn't been
+    # prepared yet, equal keys mean the exported meshes would be identical.
+    # Also returns the number of triangles the mesh will have.
+    digest = hashlib.sha1(np.ascontiguousarray(job.co))
+    faces = job.faces
+    if faces is not None:
+        for buf in (faces.verts, faces.matIndex, faces.smooth, faces.uv, faces.loops, faces.normals):
+            if buf is not None:
+                digest.update(np.ascontiguousarray(buf))
+        numTriangles = len(faces.verts)
+        if faces.loops is None and faces.verts.shape[1] == 4:
+            numTriangles += int(np.count_nonzero(faces.verts[:, 3]))
+    else:
+        # taken from the geometry cache, already triangulated
+        triangles = job.triangles
+        for buf in (triangles.tris, triangles.matIndex, triangles.smooth, triangles.uv, triangles.uvCorners, job.normals):
+            if buf is not None:
+                digest.update(np.ascontiguousarray(buf))
+        numTriangles = len(triangles.tris)
+
+    materials = tuple(id(m) for m in job.materials)
+    key = (len(job.co), numTriangles, digest.hexdigest(), materials, job.hasOrco, job.hasUV, job.smoothAngle, job.pass_index)
+    if job.hasOrco:
+        key += (tuple(job.bounds[0]), tuple(job.bounds[1]))
+
+    return key, numTriangles
+
+
+class GeometryJob(object):
+    # Everything needed to export one mesh, copied out of Blender on the main
+    # thread so the rest of the work (ORCO, transformation, triangulation and
+    # submission) doesn't need bpy anymore and can run on a worker thread
+    def __init__(self, ID, obType, pass_index, co, faces, materials, transform=None, bounds=None):
+        self.ID = ID
+        self.obType = obType
+        self.pass_index = pass_index
+        self.co = co  # untransformed vertices until prepare() is called
+        self.faces = faces
+        self.materials = materials  # YafaRay material for every Blender material index
+        self.transform = transform
+        self.bounds = bounds  # object bounding box, only for ORCO mapping
+        self.hasOrco = bounds is not None
+        self.hasUV = faces is not None and faces.uv is not None
+        self.smoothAngle = 181
+        self.indexedUVs = False
+        self.orco = None
+        self.normals = None  # per vertex, after the vertices have been split
+        self.triangles = None
+        self.matIds = None
+        self.uvTable = None
+        self.uvTris = None
+        self.uvFaceCorners = 0  # UVs sent without indexing, one per face corner
+        self.cacheKey = None
+        self.fingerprint = None
+        self.name = ""
+        self.cleanup = False
+        self.reorder = False
+        self.removedTriangles = 0
+        self.lodReport = ""
+        self.removedVertices = 0
+
+    def setCached(self, entry):
+        self.co = entry.co
+        self.orco = entry.orco
+        self.normals = entry.normals
+        self.triangles = entry.triangles
+        self.hasUV = entry.triangles.uv is not None
+        self.faces = None
+
+    def splitNormals(self):
+        # The core takes one normal per vertex, vertices with different
+        # normals in different faces are duplicated
+        normals = self.triangles.normals
+        if self.transform is not None:
+            normals = transformNormals(normals, self.transform)
+            if normals is None:
+                # singular matrix, the core smooths the mesh instead
+                self.triangles.normals = None
+                return
+        vertices, self.normals, self.triangles.tris = splitNormals(self.triangles.tris, normals)
+        self.triangles.normals = None
+        self.co = np.ascontiguousarray(self.co[vertices])
+        if self.orco is not None:
+            self.orco = np.ascontiguousarray(self.orco[vertices])
+
+    def removeDegenerates(self):
+        # Zero area triangles and vertices no triangle uses only cost memory and kd-tree build time
+        triangles = self.triangles
+        keep = ~degenerateTriangles(self.co, triangles.tris)
+        if not keep.all():
+            self.removedTriangles = len(keep) - int(np.count_nonzero(keep))
+            triangles.tris = triangles.tris[keep]
+            triangles.matIndex = triangles.matIndex[keep]
+            triangles.smooth = triangles.smooth[keep]
+            if triangles.uv is not None:
+                triangles.uvCorners = triangles.uvCorners[keep]
+
+        used, tris = unusedVertices(len(self.co), triangles.tris)
+        if not used.all():
+            self.removedVertices = len(used) - int(np.count_nonzero(used))
+            triangles.tris = np.ascontiguousarray(tris, dtype=np.int32)
+            self.co = np.ascontiguousarray(self.co[used])
+            if self.orco is not None:
+                self.orco = np.ascontiguousarray(self.orco[used])
+            if self.normals is not None:
+                self.normals = np.ascontiguousarray(self.normals[used])
+
+    def reorderSpatially(self):
+        # Triangles sorted along a Morton curve and vertices in the order they
+        # are used, so neighbouring primitives are also close in memory
+        triangles = self.triangles
+        if len(triangles.tris) < 2:
+            return
+
+        order = mortonOrder(self.co, triangles.tris)
+        triangles.tris = triangles.tris[order]
+        triangles.matIndex = triangles.matIndex[order]
+        triangles.smooth = triangles.smooth[order]
+        if triangles.uv is not None:
+            triangles.uvCorners = triangles.uvCorners[order]
+
+        vertices, tris = firstUseOrder(len(self.co), triangles.tris)
+        triangles.tris = np.ascontiguousarray(tris, dtype=np.int32)
+        self.co = np.ascontiguousarray(self.co[vertices])
+        if self.orco is not None:
+            self.orco = np.ascontiguousarray(self.orco[vertices])
+        if self.normals is not None:
+            self.normals = np.ascontiguousarray(self.normals[vertices])
+
+    def prepare(self):
+        if self.triangles is None:
+            if self.hasOrco:
+                self.orco = orcoBuffer(self.co, self.bounds[0], self.bounds[1])
+            # Transform the vertices after orcos have been stored and only if there is a transformation
+            if self.transform is not None:
+                self.co = transformBuffer(self.co, self.transform)
+            self.triangles = triangulateFaces(self.faces)
+            self.faces = None
+            if self.triangles.normals is not None:
+                self.splitNormals()
+            if self.cleanup:
+                self.removeDegenerates()
+            if self.reorder:
+                self.reorderSpatially()
+
+        self.matIds = mapMaterialIndices(self.triangles.matIndex, len(self.materials))
+
+        if self.triangles.uv is not None:
+            self.uvTable, self.uvTris = cornerUVs(self.triangles.uv, self.triangles.uvCorners)
+            self.uvFaceCorners = len(self.uvTable)
+            if self.indexedUVs:
+                self.uvTable, self.uvTris = indexUVs(self.uvTable, self.uvTris)
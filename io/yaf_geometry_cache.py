@@ -0,0 +1,177 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Geometry export cache kept between frames of an animation render. The render
+# engine instance (and the YafaRay interface) is created again for every
+# frame, so the cache lives at module level. It stores the tessellated and
+# transformed buffers of every exported mesh together with a fingerprint of
+# the evaluated mesh, so static geometry can be sent again without being
+# triangulated and transformed again.
+
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+
+def rnaFingerprint(struct, ignore=()):
+    # Values of all the plain RNA properties of a datablock or struct (such as
+    # a modifier), pointers to other datablocks by name
+    values = []
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.identifier in ignore:
+            continue
+
+        value = getattr(struct, prop.identifier, None)
+        if prop.type == 'POINTER':
+            value = getattr(value, "name", None)
+        elif prop.type == 'COLLECTION':
+            continue
+        elif prop.type == 'ENUM' and prop.is_enum_flag:
+            value = tuple(sorted(value))
+        elif getattr(prop, "is_array", False):
+            value = plainArray(value)
+
+        values.append(value)
+
+    return tuple(values)
+
+
+def plainArray(value):
+    # RNA arrays as tuples, also the nested ones such as matrices
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        return tuple(plainArray(item) for item in value)
+    return value
+
+
+def meshFingerprint(obj, mesh, co, matrix, hasOrco, uv_layer, normals=None):
+    # co are the untransformed coordinates of the evaluated mesh, normals the
+    # split normals when they are exported
+    modifiers = tuple((m.name, m.type, m.show_render) for m in obj.modifiers)
+    if matrix is not None:
+        matrix = tuple(tuple(row) for row in matrix)
+    uv = (uv_layer.name, uvCRC(mesh, uv_layer)) if uv_layer is not None else None
+    normals = zlib.crc32(normals) if normals is not None else None
+    # the cached triangles also hold the face corners, materials, smooth flags and UVs
+    faces = (bufferCRC(mesh.loops, "vertex_index", np.int32),
+             bufferCRC(mesh.polygons, "loop_total", np.int32),
+             bufferCRC(mesh.polygons, "material_index", np.int32),
+             bufferCRC(mesh.polygons, "use_smooth", np.bool_))
+
+    return (len(co), len(mesh.polygons), modifiers, zlib.crc32(co), matrix, hasOrco, uv, normals, faces)
+
+
+def bufferCRC(collection, attribute, dtype, width=1):
+    buf = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attribute, buf)
+    return zlib.crc32(buf)
+
+
+def uvCRC(mesh, uv_layer):
+    # loop UV layers have one UV per loop, tessface UV layers 4 per face in uv_raw
+    if hasattr(mesh, 'loop_triangles'):
+        return bufferCRC(uv_layer.data, "uv", np.float32, 2)
+    return bufferCRC(uv_layer.data, "uv_raw", np.float32, 8)
+
+
+class GeometryCacheEntry(object):
+    def __init__(self, fingerprint, co, orco, triangles, normals=None):
+        self.fingerprint = fingerprint
+        self.co = co
+        self.orco = orco
+        self.normals = normals
+        self.triangles = triangles
+        self.size = co.nbytes + triangles.tris.nbytes + triangles.matIndex.nbytes + triangles.smooth.nbytes
+        if orco is not None:
+            self.size += orco.nbytes
+        if normals is not None:
+            self.size += normals.nbytes
+        if triangles.uv is not None:
+            self.size += triangles.uv.nbytes + triangles.uvCorners.nbytes
+
+
+class GeometryCache(object):
+    def __init__(self, maxSize=0):
+        self.entries = OrderedDict()  # least recently used entries first
+        self.lock = threading.Lock()  # the pipelined export fills the cache from its worker thread
+        self.maxSize = maxSize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.totalHits = 0
+        self.totalMisses = 0
+
+    def beginFrame(self, maxSize):
+        # per frame statistics, the totals are kept for the whole render session
+        with self.lock:
+            self.maxSize = maxSize
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.shrink()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def get(self, key, fingerprint):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.fingerprint != fingerprint:
+                self.misses += 1
+                self.totalMisses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.totalHits += 1
+            return entry
+
+    def put(self, key, fingerprint, co, orco, triangles, normals=None):
+        entry = GeometryCacheEntry(fingerprint, co, orco, triangles, normals)
+        with self.lock:
+            self.remove(key)
+            if entry.size > self.maxSize:
+                return  # would evict everything else, don't cache it
+
+            self.entries[key] = entry
+            self.size += entry.size
+            self.shrink()
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def shrink(self):
+        while self.entries and self.size > self.maxSize:
+            key, entry = self.entries.popitem(last=False)
+            self.size -= entry.size
+            self.evictions += 1
+
+    def statistics(self):
+        return "Exporter: Geometry cache: {0} hits, {1} misses, {2} evictions this frame ({3} hits, {4} misses in total), {5} meshes, {6:.1f} of {7:.1f} MB used".format(
+            self.hits, self.misses, self.evictions, self.totalHits, self.totalMisses,
+            len(self.entries), self.size / 1048576.0, self.maxSize / 1048576.0)
+
+
+geometryCache = GeometryCache()
@@ -0,0 +1,63 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Process wide pool of warm YafaRay interfaces. Creating an interface and
+# loading the plugins (scanning the plugin directory and opening every
+# library) was paid again for every render, material preview thumbnails
+# included. The interfaces are cleared with clearAll when a render ends and
+# kept, with their plugins loaded, for the next preview or final render.
+
+import threading
+
+
+class InterfacePool(object):
+    def __init__(self, maxIdle=2):
+        self.maxIdle = maxIdle  # a preview and a final render
+        self.idle = []  # (interface, plugin path)
+        self.lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, pluginPath):
+        # Idle interface with the plugins of pluginPath loaded, None when there is none
+        with self.lock:
+            while self.idle:
+                yi, path = self.idle.pop()
+                if path == pluginPath:
+                    self.reused += 1
+                    return yi
+            self.created += 1
+            return None
+
+    def release(self, yi, pluginPath):
+        # The interface must be cleared with clearAll before
+        with self.lock:
+            if len(self.idle) < self.maxIdle:
+                self.idle.append((yi, pluginPath))
+
+    def clear(self):
+        with self.lock:
+            self.idle = []
+
+    def statistics(self):
+        return "Exporter: Interface pool: {0} interfaces created, {1} reused, {2} idle".format(self.created, self.reused, len(self.idle))
+
+
+interfacePool = InterfacePool()
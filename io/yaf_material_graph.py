@@ -0,0 +1,105 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Dependency graph of the materials of an export: every material points to
+# the textures of its used slots and blend materials also to the two
+# materials they blend. Each material is read once (texture slots, blend
+# material names looked up in bpy.data.materials) and the textures are
+# handed out once, the ones of the blended materials first, so the texture
+# export is a single ordered pass over the graph. Cycles between blend
+# materials are found while the graph is built.
+
+import bpy
+
+# depth first search states
+VISITING = 1
+DONE = 2
+
+
+class MaterialNode(object):
+    def __init__(self, material):
+        self.material = material
+        self.textures = []  # textures of the used slots, once, in slot order
+        self.components = []  # blended materials, for blend materials
+        self.missing = []  # (1 or 2, name) of the blended materials not found
+        self.cycle = None  # names of the blend materials of the cycle this one is part of
+        self.state = VISITING
+
+
+class MaterialGraph(object):
+    def __init__(self):
+        self.nodes = {}  # material -> MaterialNode
+        self.visited = set()  # materials whose textures were handed out
+        self.textures = set()  # names of the textures handed out
+        self.cycles = []
+
+    def node(self, material):
+        return self.addMaterial(material, [])
+
+    def addMaterial(self, material, path):
+        node = self.nodes.get(material)
+        if node is not None:
+            if node.state == VISITING:
+                # back to a blend material of the current path
+                cycle = path[path.index(material):] + [material]
+                names = [mat.name for mat in cycle]
+                self.cycles.append(names)
+                for mat in cycle:
+                    self.nodes[mat].cycle = names
+            return node
+
+        node = self.nodes[material] = MaterialNode(material)
+        for slot in material.texture_slots:
+            if slot and slot.texture and slot.use and slot.texture not in node.textures:
+                node.textures.append(slot.texture)
+
+        if material.mat_type == 'blend':
+            path.append(material)
+            for index, name in ((1, material.material1name), (2, material.material2name)):
+                component = bpy.data.materials.get(name)
+                if component is None:
+                    node.missing.append((index, name))
+                else:
+                    node.components.append(component)
+                    self.addMaterial(component, path)
+            path.pop()
+
+        node.state = DONE
+        return node
+
+    def pendingTextures(self, materials):
+        # Textures of the materials and of everything they blend which were
+        # not handed out yet, the ones of the blended materials first
+        textures = []
+        for material in materials:
+            self.collectTextures(self.node(material), textures)
+        return textures
+
+    def collectTextures(self, node, textures):
+        if node.material in self.visited:
+            return
+        self.visited.add(node.material)
+
+        for component in node.components:
+            self.collectTextures(self.nodes[component], textures)
+        for texture in node.textures:
+            if texture.name not in self.textures:
+                self.textures.add(texture.name)
+                textures.append(texture)
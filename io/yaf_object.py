@@ -20,9 +20,16 @@
 
 import bpy
 import time
+import hashlib
 import math
 import mathutils
+import numpy as np
 from .. import yaf_global_vars
+from . import yaf_geometry
+from . import yaf_geometry_cache
+from . import yaf_camera_view
+from .yaf_pipeline import GeometryPipeline
+from .yaf_profiler import ExportProfiler
 import yafaray_v3_interface
 
 def multiplyMatrix4x4Vector4(matrix, vector):
@@ -33,15 +40,65 @@ def multiplyMatrix4x4Vector4(matrix, vector):
     return result
 
 
+class ModifierLOD(object):
+    # Modifier changes made for the screen size LOD of one object
+    def __init__(self):
+        self.levels = []  # (modifier, original render levels)
+        self.decimate = None  # temporary decimate modifier
+        self.changes = []
+        self.report = ""
+
+
 class yafObject(object):
     def __init__(self, yi, mMap, preview):
         self.yi = yi
         self.materialMap = mMap
         self.is_preview = preview
+        self.geometryCache = None
+        self.pipeline = None
+        self.profiler = ExportProfiler()
+        self.instanceChunkSize = 65536
+        self.strandChunkSize = 65536  # hair strands per curve mesh with the bulk interface
+        self.resetExportState()
+
+    def resetExportState(self):
+        # Everything collected during one export, cleared before the next one
+        self.cameraView = None
+        self.boundsCache = {}
+        self.orcoMaterials = {}
+        self.uvCorners = 0
+        self.uvIndexed = 0
+        self.autoInstanceBases = {}
+        self.autoInstancedObjects = 0
+        self.autoInstancedTriangles = 0
+        self.pendingInstances = {}
+        self.pendingInstanceCount = {}
+        self.directMeshes = 0
+        self.cullMode = None
+        self.cullMargin = 0.0
+        self.culledObjects = 0
+        self.culledTriangles = 0
+        self.proxyBases = {}
 
     def setScene(self, scene):
 
         self.scene = scene
+        self.resetExportState()
+        self.cameraView = yaf_camera_view.getCameraView(scene) if not self.is_preview else None
+
+        # Culling needs a camera with a view frustum
+        if scene.yafaray.export.frustumCulling and self.cameraView is not None:
+            self.cullMode = scene.yafaray.export.cullingMode
+            self.cullMargin = scene.yafaray.export.cullingMargin
+
+        # The geometry cache is only useful between frames of final renders
+        if scene.yafaray.export.geometryCache and not self.is_preview:
+            self.geometryCache = yaf_geometry_cache.geometryCache
+            self.geometryCache.beginFrame(scene.yafaray.export.geometryCacheSize * 1048576)
+        else:
+            self.geometryCache = None
+            if not self.is_preview:
+                yaf_geometry_cache.geometryCache.clear()
 
     def createCameras(self):
 
@@ -185,20 +242,44 @@ class yafObject(object):
             yi.createCamera(cam.camera_name)
 
 
-    def getBBCorners(self, object):
-        bb = object.bound_box   # look bpy.types.Object if there is any problem
+    def printUVStatistics(self):
+        # YafaRay Core keeps every UV as two floats
+        if self.uvCorners:
+            saved = (self.uvCorners - self.uvIndexed) * 8
+            self.yi.printInfo("Exporter: Indexed UVs: {0} unique UVs sent for {1} face corners, {2:.2f} MB saved".format(self.uvIndexed, self.uvCorners, saved / 1048576.0))
 
-        min = [1e10, 1e10, 1e10]
-        max = [-1e10, -1e10, -1e10]
+    def startPipeline(self, maxQueued):
+        self.pipeline = GeometryPipeline(maxQueued)
+        self.pipeline.start()
 
-        for corner in bb:
-            for i in range(3):
-                if corner[i] < min[i]:
-                    min[i] = corner[i]
-                if corner[i] > max[i]:
-                    max[i] = corner[i]
+    def finishPipeline(self):
+        if self.pipeline is not None:
+            pipeline = self.pipeline
+            self.pipeline = None
+            pipeline.finish()
 
-        return min, max
+    def getBBCorners(self, object):
+        # Object space bounds, cached per object for the whole export as they
+        # are needed for every mesh, instance base or dupli using ORCO mapping
+        bounds = self.boundsCache.get(object.name)
+        if bounds is None:
+            bb = np.array([tuple(corner) for corner in object.bound_box])   # look bpy.types.Object if there is any problem
+            bounds = (bb.min(axis=0), bb.max(axis=0))
+            self.boundsCache[object.name] = bounds
+
+        return bounds
+
+    def hasOrcoMapping(self, materials):
+        # Check if any material has an orco mapped texture, cached per material
+        for mat in [mmat for mmat in materials if mmat is not None]:
+            orco = self.orcoMaterials.get(mat.name)
+            if orco is None:
+                orco = any(mtex.texture_coords == 'ORCO' for mtex in mat.texture_slots if mtex is not None)
+                self.orcoMaterials[mat.name] = orco
+            if orco:
+                return True
+
+        return False
 
     def get4x4Matrix(self, matrix):
 
@@ -208,6 +289,11 @@ class yafObject(object):
             for j in range(4):
                 ret.setVal(i, j, matrix[i][j])
 
+        # the call tape recorder can't read matrix4x4_t back
+        noteMatrix = getattr(self.yi, "noteMatrix", None)
+        if noteMatrix is not None:
+            noteMatrix(ret, matrix)
+
         return ret
 
     def writeObject(self, obj, matrix=None):
@@ -259,11 +345,142 @@ class yafObject(object):
         mat4 = obj2WorldMatrix.to_4x4()
         # mat4.transpose() --> not needed anymore: matrix indexing changed with Blender rev.42816
 
-        o2w = self.get4x4Matrix(mat4)
-
-        self.yi.addInstance(oID, o2w)
+        self.addInstances(oID, np.array(mat4, dtype=np.float32).reshape(1, 16))
         del mat4
-        del o2w
+
+    def setInstanceChunkSize(self, chunkSize):
+        self.instanceChunkSize = chunkSize
+
+    def addInstances(self, oID, matrices):
+        # Instance matrices (n, 16), row major, are collected per base object and sent
+        # in batches. A batch is sent as soon as it reaches the chunk size, so the memory
+        # used stays flat with millions of instances.
+        pending = self.pendingInstances.setdefault(oID, [])
+        pending.append(matrices)
+        self.pendingInstanceCount[oID] = self.pendingInstanceCount.get(oID, 0) + len(matrices)
+        if self.pendingInstanceCount[oID] >= self.instanceChunkSize:
+            self.flushInstances(oID)
+
+    def flushInstances(self, oID=None):
+        for baseID in ([oID] if oID is not None else list(self.pendingInstances)):
+            matrices = np.ascontiguousarray(np.concatenate(self.pendingInstances.pop(baseID)), dtype=np.float32)
+            del self.pendingInstanceCount[baseID]
+
+            if self.pipeline is not None:
+                # keep the order with the queued base geometry
+                self.pipeline.put(None, lambda data, baseID=baseID, matrices=matrices: self.submitInstances(baseID, matrices))
+            else:
+                self.submitInstances(baseID, matrices)
+
+    def submitInstances(self, oID, matrices):
+        self.yi.printVerbose("Exporting {0} Instances of ID = {1:d}".format(len(matrices), oID))
+
+        if hasattr(self.yi, "addInstances"):
+            self.yi.addInstances(oID, matrices)
+        else:
+            for mat4 in matrices.reshape(-1, 4, 4).tolist():
+                self.yi.addInstance(oID, self.get4x4Matrix(mat4))
+
+    def getInstanceCandidateKey(self, obj):
+        # Cheap key from the original mesh datablock and the modifier stack, without
+        # evaluating the object. Objects with the same key probably have the same
+        # geometry, writeAutoInstance checks it with the evaluated mesh.
+        if obj.type != 'MESH' or obj.vol_enable or obj.ml_enable or obj.bgp_enable or obj.particle_systems:
+            return None
+
+        mesh = obj.data
+        co = yaf_geometry.getVertexBuffer(mesh)
+        loops = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loops)
+        digest = hashlib.sha1(co)
+        digest.update(loops)
+
+        modifiers = tuple(yaf_geometry_cache.rnaFingerprint(m) for m in obj.modifiers)
+        materials = tuple(ms.material.name if ms.material else "" for ms in obj.material_slots)
+
+        return (len(co), len(mesh.polygons), digest.hexdigest(), modifiers, materials, obj.pass_index)
+
+    def writeAutoInstance(self, obj):
+        # Geometry is evaluated in object space and only sent once for all the
+        # objects with the same content, every object becomes an instance of it
+        job = self.evaluateGeometry(None, obj, None, obj.pass_index, 512)  # 512: base object for instances
+        if job is None:
+            return
+
+        key, numTriangles = yaf_geometry.geometryContentKey(job)
+        ID = self.autoInstanceBases.get(key)
+        if ID is None:
+            ID = self.yi.getNextFreeID()
+            self.yi.printInfo("Exporting Base Mesh: {0} with ID: {1:d}".format(obj.name, ID))
+            job.ID = ID
+            self.queueGeometry(job)
+            self.autoInstanceBases[key] = ID
+        else:
+            self.autoInstancedObjects += 1
+            self.autoInstancedTriangles += numTriangles
+
+        self.writeInstance(ID, obj.matrix_world.copy(), obj.name)
+
+    def canCull(self, obj):
+        # Mesh lights, background portals and volumes light the whole scene, hair doesn't fit in the emitter bounds
+        return (self.cullMode is not None and not obj.vol_enable and not obj.ml_enable and not obj.bgp_enable and
+                not len(obj.particle_systems))
+
+    def cullObject(self, obj, matrix=None):
+        # True when the object is outside the camera view and has been skipped or replaced by a proxy
+        if not self.canCull(obj):
+            return False
+
+        if matrix is None:
+            matrix = obj.matrix_world
+        return len(self.cullInstances(obj, np.array(matrix, dtype=np.float32).reshape(1, 16))) == 0
+
+    def cullInstances(self, obj, matrices):
+        # Placements (n, 16) of the object inside the camera view, the others are culled
+        if not self.canCull(obj) or not len(matrices):
+            return matrices
+
+        corners = np.array([tuple(corner) for corner in obj.bound_box], dtype=np.float64)
+        inside = self.cameraView.boxesInFrustum(yaf_geometry.transformCorners(corners, matrices), self.cullMargin)
+        culled = len(inside) - int(np.count_nonzero(inside))
+        if culled:
+            self.yi.printVerbose("Exporter: Culled {0} of {1} placements of {2}".format(culled, len(inside), obj.name))
+            self.culledObjects += culled
+            if obj.type == 'MESH':
+                self.culledTriangles += culled * yaf_geometry.getTriangleCount(obj.data)
+            if self.cullMode == 'PROXY':
+                self.addInstances(self.getProxyBase(obj), matrices[~inside])
+
+        return matrices[inside]
+
+    def getProxyBase(self, obj):
+        # Bounding box of the object as a base for instances, one for every object
+        ID = self.proxyBases.get(obj.name)
+        if ID is None:
+            ID = self.yi.getNextFreeID()
+            self.yi.printVerbose("Exporting Proxy Base Mesh: {0} with ID: {1:d}".format(obj.name, ID))
+            co = np.array([tuple(corner) for corner in obj.bound_box], dtype=np.float32)
+            job = yaf_geometry.GeometryJob(ID, 512, obj.pass_index, co, yaf_geometry.boxFaces(),
+                                           self.getMaterialTable([], obj.material_slots))
+            job.name = obj.name + " (proxy)"
+            self.queueGeometry(job)
+            self.proxyBases[obj.name] = ID
+
+        return ID
+
+    def printCullingStatistics(self):
+        if self.cullMode is not None:
+            self.yi.printInfo("Exporter: Frustum culling: {0} objects culled, {1} triangles not exported{2}".format(
+                self.culledObjects, self.culledTriangles, " (replaced by bounding box proxies)" if self.cullMode == 'PROXY' else ""))
+
+    def printMeshDataStatistics(self):
+        if self.directMeshes:
+            self.yi.printInfo("Exporter: {0} unmodified meshes read directly, without a render mesh copy".format(self.directMeshes))
+
+    def printAutoInstanceStatistics(self):
+        if self.autoInstanceBases:
+            self.yi.printInfo("Exporter: Automatic instancing: {0} base meshes, {1} duplicated objects instanced, {2} triangles not created in the Core".format(
+                len(self.autoInstanceBases), self.autoInstancedObjects, self.autoInstancedTriangles))
 
     def writeMesh(self, obj, matrix):
 
@@ -394,167 +611,375 @@ class yafObject(object):
 
         # Calculate BoundingBox: get the low corner (minx, miny, minz)
         # and the up corner (maxx, maxy, maxz) then apply object scale,
-        # also clamp the values to min: -1e10 and max: 1e10
+        # also clamp the values to min: -1e10 and max: 1e10.
+        # Only the 8 corners of the (modifier evaluated) object bounding box are
+        # transformed, no mesh copy is needed however dense the volume proxy is.
 
-        mesh = obj.to_mesh(self.scene, True, 'RENDER')
-        mesh.transform(matrix)
+        bbMin, bbMax = yaf_geometry.transformedBounds(obj.bound_box, matrix)
 
-        vec = [j for v in mesh.vertices for j in v.co]
-
-        yi.paramsSetFloat("minX", max(min(vec[0::3]), -1e10))
-        yi.paramsSetFloat("minY", max(min(vec[1::3]), -1e10))
-        yi.paramsSetFloat("minZ", max(min(vec[2::3]), -1e10))
-        yi.paramsSetFloat("maxX", min(max(vec[0::3]), 1e10))
-        yi.paramsSetFloat("maxY", min(max(vec[1::3]), 1e10))
-        yi.paramsSetFloat("maxZ", min(max(vec[2::3]), 1e10))
+        yi.paramsSetFloat("minX", max(float(bbMin[0]), -1e10))
+        yi.paramsSetFloat("minY", max(float(bbMin[1]), -1e10))
+        yi.paramsSetFloat("minZ", max(float(bbMin[2]), -1e10))
+        yi.paramsSetFloat("maxX", min(float(bbMax[0]), 1e10))
+        yi.paramsSetFloat("maxY", min(float(bbMax[1]), 1e10))
+        yi.paramsSetFloat("maxZ", min(float(bbMax[2]), 1e10))
 
         yi.createVolumeRegion("VR.{0}-{1}".format(obj.name, str(obj.__hash__())))
-        bpy.data.meshes.remove(mesh, do_unlink=False)
 
     def writeGeometry(self, ID, obj, matrix, pass_index, obType=0, oMat=None):
 
-        mesh = obj.to_mesh(self.scene, True, 'RENDER')
-        isSmooth = False
-        hasOrco = False
-        # test for UV Map after BMesh API changes
-        uv_texture = mesh.tessface_uv_textures if 'tessface_uv_textures' in dir(mesh) else mesh.uv_textures
-        # test for faces after BMesh API changes
-        face_attr = 'faces' if 'faces' in dir(mesh) else 'tessfaces'
-        hasUV = len(uv_texture) > 0  # check for UV's
+        with self.profiler.section("writeGeometry", obj.name):
+            job = self.evaluateGeometry(ID, obj, matrix, pass_index, obType, oMat)
+            if job is not None:
+                self.queueGeometry(job)
+
+    def evaluateGeometry(self, ID, obj, matrix, pass_index, obType=0, oMat=None):
+        if self.pipeline is None:
+            return self.readGeometry(ID, obj, matrix, pass_index, obType, oMat)
+
+        # bpy evaluation on this thread, the worker can use the interface meanwhile
+        with self.pipeline.released():
+            return self.readGeometry(ID, obj, matrix, pass_index, obType, oMat)
+
+    def queueGeometry(self, job):
+        if self.pipeline is None:
+            self.submitGeometry(self.prepareGeometry(job))
+        else:
+            self.pipeline.put(lambda: self.prepareGeometry(job), self.submitGeometry)
+
+    def applyLOD(self, obj, matrix):
+        # Cap the subdivision levels, or add a decimation, so the triangles of
+        # the object stay within the budget for the pixels it covers in the
+        # image. The modifiers are changed only for to_mesh, restoreLOD puts
+        # them back. Instance bases (no matrix) are used at many sizes and
+        # are never reduced, linked objects can't be changed.
+        export = self.scene.yafaray.export
+        if not export.screenSizeLOD or self.cameraView is None or matrix is None or obj.type != 'MESH':
+            return None
+        if obj.library is not None or obj.data.library is not None:
+            return None
+
+        bbMin, bbMax = yaf_geometry.transformedBounds(obj.bound_box, matrix)
+        size = self.cameraView.projectedSize(bbMin, bbMax)
+        baseTriangles = yaf_geometry.getTriangleCount(obj.data)
+        if math.isinf(size) or not baseTriangles:
+            return None
+
+        # pixels covered by the bounding sphere
+        budget = max(export.lodTrianglesPerPixel * math.pi * 0.25 * size * size, 1.0)
+        lod = ModifierLOD()
+        triangles = baseTriangles
+        try:
+            for mod in [m for m in obj.modifiers if m.type in {'SUBSURF', 'MULTIRES'} and m.show_render]:
+                # every subdivision level makes 4 times more faces
+                level = mod.render_levels
+                while level > 0 and triangles * 4 ** level > budget:
+                    level -= 1
+                triangles *= 4 ** level
+                if level < mod.render_levels:
+                    originalLevels = mod.render_levels
+                    mod.render_levels = level
+                    lod.levels.append((mod, originalLevels))
+                    lod.changes.append("{0} levels {1} -> {2}".format(mod.name, originalLevels, level))
+
+            if export.lodDecimate and triangles > budget:
+                ratio = max(budget / triangles, 0.01)
+                lod.decimate = obj.modifiers.new("YafaRay LOD", 'DECIMATE')
+                lod.decimate.ratio = ratio
+                lod.decimate.show_viewport = False
+                lod.changes.append("decimate ratio {0:.3f}".format(ratio))
+        except:
+            # don't leave lowered levels or the decimate modifier in the .blend file
+            self.restoreLOD(obj, lod)
+            raise
+
+        if not lod.changes:
+            return None
+
+        lod.report = "{0:.0f} pixels, {1}".format(size, ", ".join(lod.changes))
+        return lod
+
+    def restoreLOD(self, obj, lod):
+        for mod, levels in lod.levels:
+            mod.render_levels = levels
+        if lod.decimate is not None:
+            obj.modifiers.remove(lod.decimate)
+
+    def canReadMeshData(self, obj, exportNormals):
+        # True when nothing changes the mesh datablock of the object at render
+        # time: no render modifiers, shape keys or deforming parent, and not
+        # being edited. Tessfaces are only taken if Blender already has them,
+        # they must not be calculated on the datablock itself.
+        if not self.scene.yafaray.export.zeroCopyMeshes or obj.type != 'MESH':
+            return False
+
+        mesh = obj.data
+        if obj.mode == 'EDIT' or mesh.is_editmode or mesh.shape_keys is not None:
+            return False
+        if any(mod.show_render for mod in obj.modifiers):
+            return False
+        if obj.parent is not None and obj.parent_type in {'ARMATURE', 'LATTICE'}:
+            return False
+        if not hasattr(mesh, 'loop_triangles') and (exportNormals or not mesh.tessfaces):
+            return False
+
+        return True
+
+    def readGeometry(self, ID, obj, matrix, pass_index, obType, oMat):
+        # Copy everything needed from the evaluated mesh into a GeometryJob.
+        # No interface calls in here, it runs while the worker thread may be submitting.
+
+        # Blender split normals take the auto smooth angle, flat faces and custom normals into account
+        exportNormals = self.scene.yafaray.export.exportNormals
+
+        lod = self.applyLOD(obj, matrix)
+        try:
+            if self.canReadMeshData(obj, exportNormals):
+                # the evaluated mesh would be an exact copy of the datablock, read it directly
+                mesh = obj.data
+                isCopy = False
+                self.directMeshes += 1
+            else:
+                with self.profiler.section("to_mesh", obj.name):
+                    mesh = obj.to_mesh(self.scene, True, 'RENDER')
+                isCopy = True
+        finally:
+            if lod is not None:
+                self.restoreLOD(obj, lod)
+
+        if exportNormals:
+            mesh.calc_normals_split()
+
+        if hasattr(mesh, 'loop_triangles'):
+            # Newer Blender API, ngons are triangulated by Blender with the loop triangles
+            mesh.calc_loop_triangles()
+            face_attr = 'loop_triangles'
+            uv_texture = mesh.uv_layers
+        else:
+            # test for UV Map after BMesh API changes
+            uv_texture = mesh.tessface_uv_textures if 'tessface_uv_textures' in dir(mesh) else mesh.uv_textures
+            # test for faces after BMesh API changes
+            face_attr = 'faces' if 'faces' in dir(mesh) else 'tessfaces'
 
-        if face_attr == 'tessfaces':
-            if not mesh.tessfaces and mesh.polygons:
+            if face_attr == 'tessfaces' and (exportNormals or not mesh.tessfaces) and mesh.polygons:
                 # BMesh API update, check for tessellated faces, if needed calculate them...
+                # (again after calc_normals_split, so the tessfaces get the split normals)
                 mesh.update(calc_tessface=True)
 
-            if not mesh.tessfaces:
-                # if there are no faces, no need to write geometry, remove mesh data then...
-                bpy.data.meshes.remove(mesh, do_unlink=False)
-                return
-        else:
-            if not mesh.faces:
-                # if there are no faces, no need to write geometry, remove mesh data then...
-                bpy.data.meshes.remove(mesh, do_unlink=False)
-                return
-
-        # Check if the object has an orco mapped texture
-        for mat in [mmat for mmat in mesh.materials if mmat is not None]:
-            for m in [mtex for mtex in mat.texture_slots if mtex is not None]:
-                if m.texture_coords == 'ORCO':
-                    hasOrco = True
-                    break
-            if hasOrco:
-                break
-
-        # normalized vertex positions for orco mapping
-        ov = []
-
-        if hasOrco:
-            # Keep a copy of the untransformed vertex and bring them
-            # into a (-1 -1 -1) (1 1 1) bounding box
-            bbMin, bbMax = self.getBBCorners(obj)
-
-            delta = []
-
-            for i in range(3):
-                delta.append(bbMax[i] - bbMin[i])
-                if delta[i] < 0.0001:
-                    delta[i] = 1
-
-            # use untransformed mesh's vertices
-            for v in mesh.vertices:
-                normCo = []
-                for i in range(3):
-                    normCo.append(2 * (v.co[i] - bbMin[i]) / delta[i] - 1)
-
-                ov.append([normCo[0], normCo[1], normCo[2]])
-
-        # Transform the mesh after orcos have been stored and only if matrix exists
-        if matrix is not None:
-            mesh.transform(matrix)
-            
-        if self.is_preview:
-            if("checker" in obj.name):
-                matrix2 = mathutils.Matrix.Scale(4, 4)
-                mesh.transform(matrix2)
-            elif bpy.data.scenes[0].yafaray.preview.enable:
-                matrix2 = mathutils.Matrix.Scale(bpy.data.scenes[0].yafaray.preview.objScale, 4)
-                mesh.transform(matrix2)
-                matrix2 = mathutils.Matrix.Rotation(bpy.data.scenes[0].yafaray.preview.rotZ, 4, 'Z')
-                mesh.transform(matrix2)
-            pass
+        hasUV = len(uv_texture) > 0  # check for UV's
 
-        self.yi.paramsClearAll()
-        self.yi.startGeometry()
+        if not getattr(mesh, face_attr):
+            # if there are no faces, no need to write geometry, remove mesh data then...
+            if isCopy:
+                bpy.data.meshes.remove(mesh, do_unlink=False)
+            return None
 
-        self.yi.startTriMesh(ID, len(mesh.vertices), len(getattr(mesh, face_attr)), hasOrco, hasUV, obType, pass_index)
+        # to_mesh resolves the slots linked to the object into the copy, the datablock only has its own materials
+        meshMaterials = mesh.materials if isCopy else [slot.material for slot in obj.material_slots]
+        hasOrco = self.hasOrcoMapping(meshMaterials)
 
-        for ind, v in enumerate(mesh.vertices):
-            if hasOrco:
-                self.yi.addVertex(v.co[0], v.co[1], v.co[2], ov[ind][0], ov[ind][1], ov[ind][2])
+        uv_layer = None
+        if hasUV:
+            if self.is_preview:
+                uv_layer = uv_texture[0]
             else:
-                self.yi.addVertex(v.co[0], v.co[1], v.co[2])
+                uv_layer = uv_texture.active
+
+        if oMat:
+            materials = [oMat]
+        else:
+            materials = self.getMaterialTable(meshMaterials, obj.material_slots)
 
-        for index, f in enumerate(getattr(mesh, face_attr)):
-            if f.use_smooth:
-                isSmooth = True
+        # untransformed vertices of the evaluated mesh
+        co = yaf_geometry.getVertexBuffer(mesh)
+        transform = self.getGeometryTransform(obj, matrix)
+        bounds = self.getBBCorners(obj) if hasOrco else None
 
-            if oMat:
-                ymaterial = oMat
+        normals = None
+        if exportNormals:
+            if face_attr == 'loop_triangles':
+                normals = yaf_geometry.getLoopNormals(mesh)
+            else:
+                normals = yaf_geometry.getTessFaceNormals(getattr(mesh, face_attr))
+
+        job = yaf_geometry.GeometryJob(ID, obType, pass_index, co, None, materials, transform, bounds)
+        job.indexedUVs = self.scene.yafaray.export.indexedUVs
+        job.cleanup = self.scene.yafaray.export.cleanGeometry
+        job.reorder = self.scene.yafaray.export.spatialReorder
+        job.name = obj.name
+        if lod is not None:
+            job.lodReport = lod.report
+
+        if mesh.use_auto_smooth:
+            job.smoothAngle = math.degrees(mesh.auto_smooth_angle)
+        elif obj.type == 'FONT':  # getting nicer result with smooth angle 60 degr. for text objects
+            job.smoothAngle = 60
+
+        cacheEntry = None
+        if self.geometryCache is not None:
+            job.cacheKey = (obj.name, matrix is None)
+            # the cached buffers are cleaned and reordered or not
+            job.fingerprint = yaf_geometry_cache.meshFingerprint(obj, mesh, co, transform, hasOrco, uv_layer, normals) + (job.cleanup, job.reorder)
+            cacheEntry = self.geometryCache.get(job.cacheKey, job.fingerprint)
+
+        if cacheEntry is not None:
+            # Unchanged since the last frame, reuse the tessellated and transformed buffers
+            job.setCached(cacheEntry)
+        else:
+            if face_attr == 'loop_triangles':
+                job.faces = yaf_geometry.readLoopTriangles(mesh, uv_layer)
             else:
-                ymaterial = self.getFaceMaterial(mesh.materials, f.material_index, obj.material_slots)
+                job.faces = yaf_geometry.readTessFaces(getattr(mesh, face_attr), uv_layer)
+            job.faces.normals = normals
+            job.hasUV = hasUV
 
-            co = None
-            if hasUV:
+        if isCopy:
+            bpy.data.meshes.remove(mesh, do_unlink=False)
+        elif exportNormals:
+            mesh.free_normals_split()
 
-                if self.is_preview:
-                    co = uv_texture[0].data[index].uv
-                else:
-                    co = uv_texture.active.data[index].uv
+        return job
 
-                uv0 = self.yi.addUV(co[0][0], co[0][1])
-                uv1 = self.yi.addUV(co[1][0], co[1][1])
-                uv2 = self.yi.addUV(co[2][0], co[2][1])
+    def prepareGeometry(self, job):
+        # ORCO, transformation and triangulation, plain array work without bpy
+        fromCache = job.triangles is not None
+        with self.profiler.section("prepareGeometry", job.name):
+            job.prepare()
+        if self.geometryCache is not None and job.cacheKey is not None and not fromCache:
+            self.geometryCache.put(job.cacheKey, job.fingerprint, job.co, job.orco, job.triangles, job.normals)
 
-                self.yi.addTriangle(f.vertices[0], f.vertices[1], f.vertices[2], uv0, uv1, uv2, ymaterial)
-            else:
-                self.yi.addTriangle(f.vertices[0], f.vertices[1], f.vertices[2], ymaterial)
+        if job.indexedUVs and job.uvTable is not None:
+            self.uvCorners += job.uvFaceCorners
+            self.uvIndexed += len(job.uvTable)
 
-            if len(f.vertices) == 4:
-                if hasUV:
-                    uv3 = self.yi.addUV(co[3][0], co[3][1])
-                    self.yi.addTriangle(f.vertices[0], f.vertices[2], f.vertices[3], uv0, uv2, uv3, ymaterial)
-                else:
-                    self.yi.addTriangle(f.vertices[0], f.vertices[2], f.vertices[3], ymaterial)
+        return job
+
+    def submitGeometry(self, job):
+        with self.profiler.section("submitGeometry", job.name):
+            self.writeTriMesh(job)
+        self.profiler.addCounts("submitGeometry", job.name, len(job.triangles.tris), len(job.co))
+
+    def writeTriMesh(self, job):
+        triangles = job.triangles
+
+        if job.lodReport:
+            self.yi.printInfo("Exporter: LOD {0!r}: {1}".format(job.name, job.lodReport))
+
+        if job.removedTriangles or job.removedVertices:
+            self.yi.printInfo("Exporter: Geometry cleanup {0!r}: removed {1} degenerate triangles and {2} unused vertices".format(
+                job.name, job.removedTriangles, job.removedVertices))
+
+        self.yi.paramsClearAll()
+        self.yi.startGeometry()
+
+        self.yi.startTriMesh(job.ID, len(job.co), len(triangles.tris), job.hasOrco, job.hasUV, job.obType, job.pass_index)
+
+        if yaf_geometry.hasBulkInterface(self.yi):
+            self.writeGeometryBuffers(job)
+        else:
+            self.writeGeometryPerCall(job)
 
         self.yi.endTriMesh()
 
-        if isSmooth and mesh.use_auto_smooth:
-            self.yi.smoothMesh(0, math.degrees(mesh.auto_smooth_angle))
-        elif isSmooth and obj.type == 'FONT':  # getting nicer result with smooth angle 60 degr. for text objects
-            self.yi.smoothMesh(0, 60)
-        elif isSmooth:
-            self.yi.smoothMesh(0, 181)
+        # with exported normals smoothMesh doesn't calculate them again, but the
+        # core only uses the normals of meshes marked smooth by it
+        if job.normals is not None or triangles.smooth.any():
+            self.yi.smoothMesh(0, job.smoothAngle)
 
         self.yi.endGeometry()
 
-        bpy.data.meshes.remove(mesh, do_unlink=False)
+    def getGeometryTransform(self, obj, matrix):
+        # Object matrix (None when the vertices stay in object space) followed by the material preview transforms
+        if not self.is_preview:
+            return matrix
 
-    def getFaceMaterial(self, meshMats, matIndex, matSlots):
+        if "checker" in obj.name:
+            previewMatrix = mathutils.Matrix.Scale(4, 4)
+        elif bpy.data.scenes[0].yafaray.preview.enable:
+            previewMatrix = mathutils.Matrix.Rotation(bpy.data.scenes[0].yafaray.preview.rotZ, 4, 'Z') * mathutils.Matrix.Scale(bpy.data.scenes[0].yafaray.preview.objScale, 4)
+        else:
+            return matrix
 
-        ymaterial = self.materialMap["default"]
+        if matrix is None:
+            return previewMatrix
 
-        #if self.scene.gs_clay_render:
-        #    ymaterial = self.materialMap["clay"]
-        if len(meshMats) and meshMats[matIndex]:
-            mat = meshMats[matIndex]
-            if mat in self.materialMap:
-                ymaterial = self.materialMap[mat]
+        return previewMatrix * matrix
+
+    def writeGeometryPerCall(self, job):
+        # Fallback for interfaces without the bulk entry points: one call per vertex, UV and triangle
+        yi = self.yi
+        materials = job.materials
+
+        self.writeVerticesPerCall(job)
+
+        if job.uvTable is not None:
+            uvIds = np.array([yi.addUV(uv[0], uv[1]) for uv in job.uvTable.tolist()], dtype=np.int32)
+            for t, uv, m in zip(job.triangles.tris.tolist(), uvIds[job.uvTris].tolist(), job.matIds.tolist()):
+                yi.addTriangle(t[0], t[1], t[2], uv[0], uv[1], uv[2], materials[m])
+        else:
+            for t, m in zip(job.triangles.tris.tolist(), job.matIds.tolist()):
+                yi.addTriangle(t[0], t[1], t[2], materials[m])
+
+    def writeVerticesPerCall(self, job):
+        # addNormal sets the normal of the last vertex added, it must follow its addVertex
+        yi = self.yi
+        normals = job.normals.tolist() if job.normals is not None else None
+
+        if job.orco is not None:
+            for i, (v, o) in enumerate(zip(job.co.tolist(), job.orco.tolist())):
+                yi.addVertex(v[0], v[1], v[2], o[0], o[1], o[2])
+                if normals is not None:
+                    n = normals[i]
+                    yi.addNormal(n[0], n[1], n[2])
+        else:
+            for i, v in enumerate(job.co.tolist()):
+                yi.addVertex(v[0], v[1], v[2])
+                if normals is not None:
+                    n = normals[i]
+                    yi.addNormal(n[0], n[1], n[2])
+
+    def writeGeometryBuffers(self, job):
+        # Hand the whole mesh over to the interface in one call per buffer
+        if job.normals is not None and not hasattr(self.yi, "addNormalArray"):
+            # the normals can only follow their vertices one by one
+            self.writeVerticesPerCall(job)
         else:
-            for mat_slots in [ms for ms in matSlots if ms.material in self.materialMap]:
-                ymaterial = self.materialMap[mat_slots.material]
+            if job.orco is not None:
+                self.yi.addVertexArray(job.co, job.orco)
+            else:
+                self.yi.addVertexArray(job.co)
+            if job.normals is not None:
+                self.yi.addNormalArray(job.normals)
+
+        uvTris = None
+        if job.uvTable is not None:
+            firstUV = self.yi.addUVArray(job.uvTable)
+            uvTris = job.uvTris + firstUV
+
+        self.yi.addTriangleArray(job.triangles.tris, uvTris, job.matIds, job.materials)
+
+    def getMaterialTable(self, meshMats, matSlots):
+        # YafaRay material for every Blender material index of the mesh, built once per mesh
+        # instead of looking up the material of every face
+
+        # faces without a (known) mesh material get the last exported slot material, or the default one
+        fallback = self.materialMap["default"]
+        #if self.scene.gs_clay_render:
+        #    fallback = self.materialMap["clay"]
+        for mat_slots in [ms for ms in matSlots if ms.material in self.materialMap]:
+            fallback = self.materialMap[mat_slots.material]
+
+        if not len(meshMats):
+            return [fallback]
 
-        return ymaterial
+        table = []
+        for mat in meshMats:
+            if mat:
+                table.append(self.materialMap.get(mat, self.materialMap["default"]))
+            else:
+                table.append(fallback)
+
+        return table
 
     def writeParticleStrands(self, object, matrix):
 
@@ -587,27 +1012,38 @@ class yafObject(object):
                         strandEnd = 0.01
                         strandShape = 0.0
 
-                    for particle in pSys.particles:
-                        if particle.is_exist and particle.is_visible:
-                            p = True
-                        else:
-                            p = False
-                        CID = yi.getNextFreeID()
-                        yi.paramsClearAll()
-                        yi.startGeometry()
-                        yi.startCurveMesh(CID, p)
-                        for location in particle.hair_keys:
-                            vertex = matrix * location.co  # use reverse vector multiply order, API changed with rev. 38674
-                            yi.addVertex(vertex[0], vertex[1], vertex[2])
-                        #this section will be changed after the material settings been exported
-                        if self.materialMap[pmaterial]:
-                            yi.endCurveMesh(self.materialMap[pmaterial], strandStart, strandEnd, strandShape)
-                        else:
-                            yi.endCurveMesh(self.materialMap["default"], strandStart, strandEnd, strandShape)
-                    # TODO: keep object smooth
-                    #yi.smoothMesh(0, 60.0)
-                        yi.endGeometry()
-                    yi.printInfo("Exporter: Particle creation time: {0:.3f}".format(time.time() - tstart))
+                    #this section will be changed after the material settings been exported
+                    if self.materialMap[pmaterial]:
+                        ymaterial = self.materialMap[pmaterial]
+                    else:
+                        ymaterial = self.materialMap["default"]
+
+                    # All the hair keys in one buffer, transformed with a single matrix multiply
+                    counts, co = yaf_geometry.getHairKeys(pSys.particles)
+                    co = yaf_geometry.transformBuffer(co, matrix)
+                    visible = yaf_geometry.getParticleVisibility(pSys.particles)
+
+                    if pmaterial != "default" and pmaterial.strand_lod:
+                        angle, density = self.getStrandLOD(pmaterial, object, matrix)
+                        numStrands = len(counts)
+                        numKeys = len(co)
+                        if density < 1.0:
+                            counts, co, visible = yaf_geometry.thinStrands(counts, co, visible, density)
+                            # fewer but wider strands keep the coverage
+                            strandStart /= density
+                            strandEnd /= density
+                        if angle > 0.0:
+                            counts, co = yaf_geometry.simplifyStrands(counts, co, angle)
+                        yi.printInfo("Exporter: Strand LOD {0!r}: density {1:.3f}, key angle {2:.1f}, {3} of {4} strands, {5} of {6} keys".format(
+                            pSys.name, density, math.degrees(angle), len(counts), numStrands, len(co), numKeys))
+
+                    if hasattr(yi, "addCurveArray"):
+                        self.writeStrandChunks(counts, co, visible, ymaterial, strandStart, strandEnd, strandShape)
+                    else:
+                        self.writeStrandsPerCall(counts, co, visible, ymaterial, strandStart, strandEnd, strandShape)
+
+                    yi.printInfo("Exporter: Hair Particle System {0!r}: {1} strands, {2} keys, creation time: {3:.3f}".format(
+                        pSys.name, len(counts), len(co), time.time() - tstart))
 
                     if pSys.settings.use_render_emitter:
                         renderEmitter = True
@@ -618,3 +1054,46 @@ class yafObject(object):
         if renderEmitter:
             # ymat = self.materialMap["default"]  /* UNUSED */
             self.writeMesh(object, matrix)
+
+    def getStrandLOD(self, pmaterial, object, matrix):
+        # Key angle and strand density used for the hair of a material
+        angle = pmaterial.strand_lod_angle
+        density = pmaterial.strand_lod_density
+        if pmaterial.strand_lod_camera and self.cameraView is not None:
+            bbMin, bbMax = yaf_geometry.transformedBounds(object.bound_box, matrix)
+            factor = min(self.cameraView.projectedSize(bbMin, bbMax) / pmaterial.strand_lod_pixels, 1.0)
+            density = max(density, factor)
+            angle = min(angle / max(factor, 0.01), math.radians(90.0))
+
+        return angle, density
+
+    def writeStrandChunks(self, counts, co, visible, ymaterial, strandStart, strandEnd, strandShape):
+        # Many strands in one curve mesh: key coordinates of the chunk, number of
+        # keys and visibility of every strand
+        yi = self.yi
+        for start, end, keyStart, keyEnd in yaf_geometry.strandChunks(counts, self.strandChunkSize):
+            CID = yi.getNextFreeID()
+            yi.paramsClearAll()
+            yi.startGeometry()
+            yi.startCurveMesh(CID, True)
+            yi.addCurveArray(np.ascontiguousarray(co[keyStart:keyEnd]), np.ascontiguousarray(counts[start:end]),
+                             np.ascontiguousarray(visible[start:end]))
+            yi.endCurveMesh(ymaterial, strandStart, strandEnd, strandShape)
+            yi.endGeometry()
+
+    def writeStrandsPerCall(self, counts, co, visible, ymaterial, strandStart, strandEnd, strandShape):
+        # Older YafaRay Core builds need one curve mesh per strand
+        yi = self.yi
+        end = 0
+        for count, p in zip(counts.tolist(), visible.tolist()):
+            start, end = end, end + count
+            CID = yi.getNextFreeID()
+            yi.paramsClearAll()
+            yi.startGeometry()
+            yi.startCurveMesh(CID, p)
+            for vertex in co[start:end].tolist():
+                yi.addVertex(vertex[0], vertex[1], vertex[2])
+            yi.endCurveMesh(ymaterial, strandStart, strandEnd, strandShape)
+            # TODO: keep object smooth
+            #yi.smoothMesh(0, 60.0)
+            yi.endGeometry()
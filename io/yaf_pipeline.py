@@ -0,0 +1,93 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Producer/consumer pipeline for the geometry export. The main thread
+# evaluates the meshes with bpy and copies them into plain buffers, a worker
+# thread does the array work and talks to the YafaRay interface.
+#
+# The interface keeps state between calls (paramsClearAll/paramsSet*,
+# startGeometry...endGeometry), so only one thread may use it at a time. The
+# main thread owns the interface lock while the pipeline runs and only gives
+# it away while it is busy evaluating meshes (see released()), which is when
+# the worker submits the geometry it has prepared.
+
+import queue
+import threading
+import traceback
+from contextlib import contextmanager
+
+
+class GeometryPipeline(object):
+    def __init__(self, maxQueued):
+        self.queue = queue.Queue(maxQueued)
+        self.lock = threading.RLock()
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="YafaRay geometry export")
+        self.thread.daemon = True
+
+    def start(self):
+        self.lock.acquire()
+        self.thread.start()
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+
+            prepare, submit = job
+            if self.error is not None:
+                continue  # drain the queue so the main thread is never blocked
+
+            try:
+                data = prepare() if prepare is not None else None
+                with self.lock:
+                    submit(data)
+            except BaseException as e:
+                print("Exporter: Exception in the geometry export thread:")
+                traceback.print_exc()
+                self.error = e
+
+    @contextmanager
+    def released(self):
+        # Let the worker use the interface while the main thread does bpy work
+        self.lock.release()
+        try:
+            yield
+        finally:
+            self.lock.acquire()
+
+    def put(self, prepare, submit):
+        # prepare() runs on the worker without the lock, submit(data) with it.
+        # The lock is released while waiting for room in the queue, otherwise
+        # the worker could never submit what is already queued.
+        if self.error is not None:
+            raise self.error
+        with self.released():
+            self.queue.put((prepare, submit))
+
+    def finish(self):
+        # Wait for all queued geometry, the interface is only used by the main thread afterwards
+        with self.released():
+            self.queue.put(None)
+            self.thread.join()
+        self.lock.release()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,120 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Timing of the export stages. Every section is recorded per (section, item)
+# pair, item being an object, material or texture name or "" for whole
+# stages, with its number of calls, wall time and the triangles/vertices
+# exported. Sections may be recorded from the geometry export thread too.
+
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ProfileRecord(object):
+    def __init__(self, section, item):
+        self.section = section
+        self.item = item
+        self.calls = 0
+        self.seconds = 0.0
+        self.triangles = 0
+        self.vertices = 0
+
+    def asDict(self):
+        return {"section": self.section, "item": self.item, "calls": self.calls, "seconds": self.seconds,
+                "triangles": self.triangles, "vertices": self.vertices}
+
+
+class ExportProfiler(object):
+    fields = ("section", "item", "calls", "seconds", "triangles", "vertices")
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.records = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def getRecord(self, section, item):
+        record = self.records.get((section, item))
+        if record is None:
+            record = ProfileRecord(section, item)
+            self.records[(section, item)] = record
+        return record
+
+    @contextmanager
+    def section(self, section, item=""):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                record = self.getRecord(section, item)
+                record.calls += 1
+                record.seconds += seconds
+
+    def addCounts(self, section, item, triangles=0, vertices=0):
+        if self.enabled:
+            with self.lock:
+                record = self.getRecord(section, item)
+                record.triangles += triangles
+                record.vertices += vertices
+
+    def sortedRecords(self):
+        with self.lock:
+            return sorted(self.records.values(), key=lambda record: record.seconds, reverse=True)
+
+    def writeReport(self, basePath, info):
+        # basePath + ".json" and basePath + ".csv", returns the written paths
+        records = self.sortedRecords()
+        report = dict(info)
+        report["total_seconds"] = time.time() - self.started
+        report["sections"] = [record.asDict() for record in records]
+
+        with open(basePath + ".json", "w") as jsonFile:
+            json.dump(report, jsonFile, indent=1)
+
+        with open(basePath + ".csv", "w", newline="") as csvFile:
+            writer = csv.writer(csvFile)
+            writer.writerow(self.fields)
+            for record in records:
+                writer.writerow([getattr(record, field) for field in self.fields])
+
+        return basePath + ".json", basePath + ".csv"
+
+    def summary(self, count=10):
+        # Lines with the whole stages first and then the most expensive objects/materials/textures
+        records = self.sortedRecords()
+        lines = ["Exporter: Profile: export stages:"]
+        for record in [r for r in records if not r.item]:
+            lines.append("  {0:9.3f} s  {1:7d} calls  {2}".format(record.seconds, record.calls, record.section))
+        lines.append("Exporter: Profile: top {0} items:".format(count))
+        for record in [r for r in records if r.item][:count]:
+            counts = ""
+            if record.triangles or record.vertices:
+                counts = "  ({0} triangles, {1} vertices)".format(record.triangles, record.vertices)
+            lines.append("  {0:9.3f} s  {1:7d} calls  {2}: {3}{4}".format(record.seconds, record.calls, record.section, record.item, counts))
+        return lines
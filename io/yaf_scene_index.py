@@ -0,0 +1,116 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Scene classification built with a single pass over scene.objects at the
+# start of every export. The texture, material, lamp, geometry and render
+# settings stages use its lists instead of walking the scene again and
+# reading the same RNA attributes (visibility, layers, types) once per stage.
+
+import numpy as np
+
+NUM_LAYERS = 20
+LAYER_BITS = np.array([1 << i for i in range(NUM_LAYERS)], dtype=np.int64)
+
+GEOMETRY_TYPES = {'MESH', 'SURFACE', 'CURVE', 'FONT', 'EMPTY'}
+
+# kinds of the renderable geometry objects, in the order exportGeometry checks them
+DUPLICATOR = 0
+EMPTY = 1
+SHARED_DATA = 2  # data block used by other objects too, exported as instances
+SINGLE = 3
+
+
+def layerMask(layers):
+    # the 20 layer states as the bits of an integer
+    mask = 0
+    for i, layer in enumerate(layers):
+        if layer:
+            mask |= 1 << i
+    return mask
+
+
+def objectLayerMasks(objects):
+    # Layer bitmasks of all the objects, read in bulk
+    states = np.empty(len(objects) * NUM_LAYERS, dtype=np.bool_)
+    try:
+        objects.foreach_get("layers", states)
+    except (AttributeError, TypeError, RuntimeError):
+        return [layerMask(obj.layers) for obj in objects]
+    return np.dot(states.reshape(-1, NUM_LAYERS).astype(np.int64), LAYER_BITS).tolist()
+
+
+class SceneIndex(object):
+    def __init__(self, scene):
+        self.lamps = []  # visible lamps
+        self.geometry = []  # (object, kind) of the renderable objects, in scene order
+        self.sharedData = {}  # data block name -> renderable objects using it
+        self.camera = None  # first camera object of the scene
+        self.materials = []  # materials of all the objects, once, in slot order
+        self.numObjects = 0
+
+        self.build(scene)
+
+    def build(self, scene):
+        self.sceneLayerMask = layerMask(scene.layers)
+        objects = scene.objects
+        layerMasks = objectLayerMasks(objects)
+        materials = set()
+
+        for obj, objectLayers in zip(objects, layerMasks):
+            self.numObjects += 1
+            objType = obj.type
+
+            for slot in obj.material_slots:
+                material = slot.material
+                if material is not None and material not in materials:
+                    materials.add(material)
+                    self.materials.append(material)
+
+            if objType == 'CAMERA':
+                if self.camera is None:
+                    self.camera = obj
+                continue
+
+            if obj.hide_render:
+                continue
+
+            if objType == 'LAMP':
+                # is_visible also checks the layers, the bitmask skips the call for most hidden lamps
+                if objectLayers & self.sceneLayerMask and obj.is_visible(scene):
+                    self.lamps.append(obj)
+
+            elif objType in GEOMETRY_TYPES:
+                if not objectLayers & self.sceneLayerMask or not (obj.is_visible(scene) or obj.hide):
+                    continue
+
+                if obj.is_duplicator:
+                    kind = DUPLICATOR
+                elif objType == 'EMPTY':
+                    kind = EMPTY
+                elif obj.data.users > 1:
+                    kind = SHARED_DATA
+                    self.sharedData.setdefault(obj.data.name, []).append(obj)
+                else:
+                    kind = SINGLE
+                self.geometry.append((obj, kind))
+
+    def statistics(self):
+        return "Exporter: Scene index: {0} objects, {1} renderable, {2} lamps, {3} shared data blocks, {4} materials".format(
+            self.numObjects, len(self.geometry), len(self.lamps), len(self.sharedData), len(self.materials))
@@ -19,6 +19,7 @@
 # <pep8 compliant>
 
 import bpy
+import math
 from bpy.props import (FloatProperty,
                        IntProperty,                       
                        BoolProperty,
@@ -367,6 +368,36 @@ def register():
         min=1.0,
         default=1.0)
 
+    Material.strand_lod = BoolProperty(
+        name="Strand LOD",
+        description="Export simplified hair strands using this material, for draft and background renders",
+        default=False)
+
+    Material.strand_lod_angle = FloatProperty(
+        name="Key angle",
+        description="Hair keys where the strand bends less than this angle are not exported",
+        subtype='ANGLE',
+        min=0.0, max=math.radians(90.0),
+        default=math.radians(5.0))
+
+    Material.strand_lod_density = FloatProperty(
+        name="Density",
+        description="Fraction of the hair strands exported, the remaining strands are made wider to keep the coverage",
+        min=0.01, max=1.0,
+        step=1, precision=3,
+        default=1.0)
+
+    Material.strand_lod_camera = BoolProperty(
+        name="Camera driven",
+        description="Simplify the hair depending on the size of the object in the camera view. Density is then the lowest density used for tiny objects",
+        default=False)
+
+    Material.strand_lod_pixels = FloatProperty(
+        name="Full detail size",
+        description="Size of the object in the image, in pixels, from which the hair is exported with full density and the base key angle",
+        min=1.0,
+        default=500.0)
+
 def unregister():
     del Material.mat_type
     del Material.diffuse_reflect
@@ -413,3 +444,8 @@ def unregister():
     del Material.wireframe_exponent
     del Material.wireframe_color
     del Material.samplingfactor
+    del Material.strand_lod
+    del Material.strand_lod_angle
+    del Material.strand_lod_density
+    del Material.strand_lod_camera
+    del Material.strand_lod_pixels
@@ -98,6 +98,12 @@ class YafaRayLoggingProperties(bpy.types.PropertyGroup):
         ),
         default="info")
 
+    exportProfiler = BoolProperty(
+        name="Export profiler",
+        description=("Time the export stages and every object, material and texture. A summary is shown in the"
+                     " console and JSON/CSV reports are written next to the render output"),
+        default=False)
+
     drawRenderSettings = BoolProperty(
         name="Draw Render Settings",
         description="Draw Render Settings in the params badge",
@@ -149,6 +155,146 @@ class YafaRayLoggingProperties(bpy.types.PropertyGroup):
         min=0.2, max=5.0, precision=1,
         default=1.0)
 
+
+class YafaRayExportProperties(bpy.types.PropertyGroup):
+    geometryCache = BoolProperty(
+        name="Geometry cache",
+        description=("Keep the exported geometry between frames of an animation render"
+                     " and send it again without re-tessellating the meshes that did not change"),
+        default=False)
+
+    geometryCacheSize = IntProperty(
+        name="Cache size (MB)",
+        description="Maximum memory used by the geometry cache, least recently used meshes are dropped first",
+        min=16, max=65536,
+        default=1024)
+
+    pipelinedExport = BoolProperty(
+        name="Pipelined export",
+        description=("Evaluate the meshes in Blender while a worker thread converts"
+                     " and sends the previous ones to YafaRay"),
+        default=False)
+
+    pipelineQueueSize = IntProperty(
+        name="Queue size",
+        description="Maximum number of evaluated meshes waiting for the worker thread, limits the extra memory used",
+        min=1, max=64,
+        default=4)
+
+    indexedUVs = BoolProperty(
+        name="Indexed UVs",
+        description=("Send every distinct UV of a mesh only once and share it between"
+                     " the faces using it, instead of sending the UVs of every face corner"),
+        default=False)
+
+    autoInstancing = BoolProperty(
+        name="Automatic instancing",
+        description=("Detect objects with identical geometry in different mesh data blocks"
+                     " (for example appended several times) and export them as instances. Needs Use Instances"),
+        default=False)
+
+    exportNormals = BoolProperty(
+        name="Export normals",
+        description=("Send Blender split normals (auto smooth, flat faces and custom normals) with the meshes"
+                     " instead of letting YafaRay smooth them"),
+        default=False)
+
+    zeroCopyMeshes = BoolProperty(
+        name="Read unmodified meshes",
+        description=("Read meshes without modifiers, shape keys or deforming parents directly from their datablock"
+                     " instead of making a render copy of them"),
+        default=True)
+
+    cleanGeometry = BoolProperty(
+        name="Clean geometry",
+        description="Remove zero area triangles and vertices not used by any triangle before sending the meshes to YafaRay",
+        default=False)
+
+    spatialReorder = BoolProperty(
+        name="Spatial reorder",
+        description=("Sort the triangles of every mesh along a Morton (Z-order) curve and the vertices in the order"
+                     " they are used, for better memory locality when YafaRay builds the acceleration structure"),
+        default=False)
+
+    frustumCulling = BoolProperty(
+        name="Frustum culling",
+        description=("Don't export objects outside the camera view, for fast lookdev and draft renders."
+                     " Objects outside the view can still cast shadows and reflections, so the render will change"),
+        default=False)
+
+    cullingMode = EnumProperty(
+        name="Culled objects",
+        description="What to export for the objects outside the camera view",
+        items=(
+            ('SKIP', "Skip", "Don't export the objects outside the camera view"),
+            ('PROXY', "Bounding box", "Export the bounding box of the objects outside the camera view, keeping some of their shadows and indirect light")
+        ),
+        default='SKIP')
+
+    cullingMargin = FloatProperty(
+        name="Margin",
+        description="Widen the camera view used for culling by this fraction of the image size on every side",
+        min=0.0, max=10.0,
+        default=0.1)
+
+    screenSizeLOD = BoolProperty(
+        name="Screen size LOD",
+        description=("Lower the subdivision levels of objects (and optionally decimate them) depending on their size"
+                     " in the camera view, so they don't have more triangles than the budget for the pixels they cover"),
+        default=False)
+
+    lodTrianglesPerPixel = FloatProperty(
+        name="Triangles per pixel",
+        description="Triangle budget for every pixel an object covers in the image",
+        min=0.001, max=100.0,
+        default=1.0)
+
+    lodDecimate = BoolProperty(
+        name="Decimate",
+        description="Decimate objects still over the triangle budget without subdivision",
+        default=False)
+
+    instanceChunkSize = IntProperty(
+        name="Instance batch size",
+        description=("Number of instance matrices collected per base object before sending them to YafaRay."
+                     " Lower values use less memory with millions of instances"),
+        min=1, max=10000000,
+        default=65536)
+
+    callTape = BoolProperty(
+        name="Call tape",
+        description=("Record everything sent to YafaRay for a frame of a saved .blend file and replay it when the same"
+                     " frame is rendered again, skipping the scene export. Not used with unsaved changes, changes to"
+                     " linked libraries or image files are not detected. While recording, all the geometry buffers"
+                     " sent to YafaRay are kept until the export ends and the tape is encoded in memory before it is"
+                     " compressed, so the export needs about two to three times the memory of the exported geometry"),
+        default=False)
+
+    callTapeDirectory = StringProperty(
+        name="Tape directory",
+        description="Directory for the call tapes, can be shared by render farm nodes. Empty for the system temporary directory",
+        subtype='DIR_PATH',
+        default="")
+
+    callTapeMaxSize = IntProperty(
+        name="Tape directory size (MB)",
+        description="Maximum disk space used by the call tapes, least recently used tapes are deleted first",
+        min=16, max=1048576,
+        default=4096)
+
+    incrementalExport = BoolProperty(
+        name="Incremental export",
+        description=("Keep what is sent to YafaRay for every texture, material, lamp and mesh object between renders"
+                     " and send it again without exporting from Blender when the datablock and what it uses didn't"
+                     " change. Objects deformed by other objects are always exported again"),
+        default=False)
+
+    interfacePool = BoolProperty(
+        name="Warm interfaces",
+        description=("Keep the YafaRay interfaces, with their plugins loaded, between renders and material previews"
+                     " instead of creating them and loading the plugins again for every render"),
+        default=True)
+
     
 class YafaRayNoiseControlProperties(bpy.types.PropertyGroup):
     resampled_floor = FloatProperty(
@@ -1313,6 +1459,9 @@ def register():
     bpy.utils.register_class(YafaRayMaterialPreviewControlProperties)
     YafaRayProperties.preview = PointerProperty(type=YafaRayMaterialPreviewControlProperties)
 
+    bpy.utils.register_class(YafaRayExportProperties)
+    YafaRayProperties.export = PointerProperty(type=YafaRayExportProperties)
+
 def unregister():
     Scene.gs_ray_depth
     Scene.gs_shadow_depth
@@ -1405,4 +1554,5 @@ def unregister():
     bpy.utils.unregister_class(YafaRayNoiseControlProperties)
     bpy.utils.unregister_class(YafaRayRenderPassesProperties)
     bpy.utils.unregister_class(YafaRayMaterialPreviewControlProperties)
+    bpy.utils.unregister_class(YafaRayExportProperties)
     bpy.utils.unregister_class(YafaRayProperties)
@@ -0,0 +1,331 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Lightweight stand-ins for the bpy and mathutils modules and builders for
+# synthetic scenes, just what the exporter reads from Blender 2.7x datablocks
+# (tessfaces, texture slots, lamp data...). Nothing here tries to behave like
+# Blender beyond that.
+
+import math
+import sys
+import types
+import numpy as np
+
+
+class Struct(object):
+    # Plain attribute bag standing in for any RNA struct
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+class Collection(object):
+    # bpy_prop_collection with foreach_get over numpy arrays, one row per item
+    def __init__(self, items=(), active=None, **arrays):
+        self.items = list(items)
+        self.active = active
+        self.arrays = {name: np.asarray(values) for name, values in arrays.items()}
+        if arrays:
+            self.length = len(next(iter(self.arrays.values())))
+        else:
+            self.length = len(self.items)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def foreach_get(self, attr, buffer):
+        buffer[:] = self.arrays[attr].ravel()
+
+
+class Vector(object):
+    def __init__(self, values):
+        self.values = np.array(values, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values.tolist())
+
+    def __getitem__(self, index):
+        return float(self.values[index])
+
+    def __setitem__(self, index, value):
+        self.values[index] = value
+
+    def __add__(self, other):
+        return Vector(self.values + np.asarray(tuple(other)))
+
+    def __sub__(self, other):
+        return Vector(self.values - np.asarray(tuple(other)))
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return Vector(self.values * other)
+        return float(np.dot(self.values, np.asarray(tuple(other))))
+
+    @property
+    def xyz(self):
+        return Vector(self.values[:3])
+
+    @property
+    def length(self):
+        return float(np.linalg.norm(self.values))
+
+
+class MatrixColumns(object):
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def __getitem__(self, index):
+        return Vector(self.matrix.values[:, index])
+
+
+class Matrix(object):
+    # 4x4 mathutils.Matrix, rows first like in Blender since rev. 42816
+    def __init__(self, rows=None):
+        self.values = np.identity(4) if rows is None else np.array(rows, dtype=np.float64)
+
+    def __array__(self, dtype=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __mul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix(np.dot(self.values, other.values))
+        v = np.asarray(tuple(other), dtype=np.float64)
+        if len(v) == 3:
+            return Vector(np.dot(self.values[:3, :3], v) + self.values[:3, 3])
+        return Vector(np.dot(self.values, v))
+
+    @property
+    def col(self):
+        return MatrixColumns(self)
+
+    def copy(self):
+        return Matrix(self.values)
+
+    def to_4x4(self):
+        return Matrix(self.values)
+
+    def inverted(self):
+        return Matrix(np.linalg.inv(self.values))
+
+    def transposed(self):
+        return Matrix(self.values.T)
+
+    @staticmethod
+    def Identity(size=4):
+        return Matrix()
+
+    @staticmethod
+    def Translation(vector):
+        m = Matrix()
+        m.values[:3, 3] = tuple(vector)[:3]
+        return m
+
+    @staticmethod
+    def Scale(factor, size=4, axis=None):
+        m = Matrix()
+        m.values[0, 0] = m.values[1, 1] = m.values[2, 2] = factor
+        return m
+
+    @staticmethod
+    def Rotation(angle, size=4, axis='Z'):
+        c, s = math.cos(angle), math.sin(angle)
+        i, j = {'X': (1, 2), 'Y': (2, 0), 'Z': (0, 1)}[axis]
+        m = Matrix()
+        m.values[i, i] = m.values[j, j] = c
+        m.values[i, j] = -s
+        m.values[j, i] = s
+        return m
+
+
+class MeshStore(object):
+    # bpy.data.meshes, the render copies of to_mesh are removed again by the exporter
+    def __init__(self):
+        self.removed = 0
+
+    def remove(self, mesh, do_unlink=True):
+        self.removed += 1
+
+
+def install():
+    # Register bpy, bpy.path and mathutils in sys.modules, before the exporter modules are imported
+    bpy = types.ModuleType("bpy")
+    bpy.data = Struct(meshes=MeshStore(), materials={}, scenes=[], objects={}, filepath="", is_dirty=False)
+    bpy.types = Struct()
+    bpy.app = Struct(version=(2, 79, 0))
+
+    path = types.ModuleType("bpy.path")
+    path.abspath = lambda filepath, start=None, library=None: filepath
+    path.clean_name = lambda name, replace="_": "".join(c if c.isalnum() else replace for c in name)
+    bpy.path = path
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Matrix = Matrix
+    mathutils.Vector = Vector
+
+    sys.modules["bpy"] = bpy
+    sys.modules["bpy.path"] = path
+    sys.modules["mathutils"] = mathutils
+    return bpy
+
+
+def exportSettings(**overrides):
+    # scene.yafaray.export with the property defaults
+    settings = dict(
+        geometryCache=False, geometryCacheSize=1024, pipelinedExport=False, pipelineQueueSize=4,
+        indexedUVs=False, autoInstancing=False, exportNormals=False, zeroCopyMeshes=True,
+        cleanGeometry=False, spatialReorder=False, frustumCulling=False, cullingMode='SKIP',
+        cullingMargin=0.1, screenSizeLOD=False, lodTrianglesPerPixel=1.0, lodDecimate=False,
+        instanceChunkSize=65536)
+    settings.update(overrides)
+    return Struct(**settings)
+
+
+def makeScene(**exportOverrides):
+    render = Struct(resolution_x=1920, resolution_y=1080, resolution_percentage=100, use_multiview=False)
+    yafaray = Struct(export=exportSettings(**exportOverrides),
+                     logging=Struct(exportProfiler=False),
+                     preview=Struct(enable=False))
+    return Struct(name="Scene", camera=None, render=render, yafaray=yafaray, frame_current=1,
+                  gs_clay_render=False, gs_clay_render_keep_transparency=False,
+                  gs_clay_render_keep_normals=False, gs_clay_oren_nayar=False)
+
+
+def makeGridMesh(name, size, materials):
+    # size x size quads in the XY plane as Blender 2.7x tessfaces, one UV
+    # layer, the material indices cycling through the materials
+    n = size + 1
+    x, y = np.meshgrid(np.linspace(-1.0, 1.0, n), np.linspace(-1.0, 1.0, n))
+    co = np.column_stack((x.ravel(), y.ravel(), np.zeros(n * n))).astype(np.float32)
+
+    i, j = np.meshgrid(np.arange(size), np.arange(size))
+    first = (j * n + i).ravel()
+    verts = np.column_stack((first, first + 1, first + n + 1, first + n)).astype(np.int32)
+    numFaces = len(verts)
+
+    uv = co[verts.ravel(), :2].reshape(numFaces, 8) * 0.5 + 0.5
+    matIndex = np.arange(numFaces, dtype=np.int32) % max(len(materials), 1)
+    smooth = np.ones(numFaces, dtype=np.bool_)
+    normals = np.tile(np.array((0.0, 0.0, 1.0), dtype=np.float32), (numFaces, 4))
+
+    uvLayer = Struct(name="UVMap", data=Collection(uv_raw=uv))
+    return Struct(
+        name=name,
+        library=None,
+        vertices=Collection(co=co),
+        polygons=Collection(loop_total=np.full(numFaces, 4, dtype=np.int32), material_index=matIndex, use_smooth=smooth),
+        loops=Collection(vertex_index=verts.ravel()),
+        tessfaces=Collection(vertices_raw=verts, material_index=matIndex, use_smooth=smooth, split_normals=normals),
+        tessface_uv_textures=Collection([uvLayer], active=uvLayer),
+        materials=list(materials),
+        use_auto_smooth=False,
+        auto_smooth_angle=math.radians(30.0),
+        shape_keys=None,
+        is_editmode=False,
+        update=lambda calc_tessface=False: None,
+        calc_normals_split=lambda: None,
+        free_normals_split=lambda: None)
+
+
+def makeObject(name, mesh, location):
+    obj = Struct(
+        name=name, type='MESH', data=mesh, library=None, mode='OBJECT', parent=None, parent_type='OBJECT',
+        matrix_world=Matrix.Translation(location),
+        vol_enable=False, ml_enable=False, bgp_enable=False, particle_systems=[],
+        pass_index=0, modifiers=Collection(), active_material=mesh.materials[0] if mesh.materials else None,
+        material_slots=[Struct(material=mat) for mat in mesh.materials],
+        bound_box=[(x, y, z) for x in (-1.0, 1.0) for y in (-1.0, 1.0) for z in (0.0, 0.0)])
+    # evaluated mesh, only asked for when the mesh data can't be read directly
+    obj.to_mesh = lambda scene, apply_modifiers, settings: mesh
+    return obj
+
+
+def makeTexture(name):
+    # Procedural clouds, no image files needed
+    return Struct(
+        name=name, yaf_tex_type='CLOUDS', use_color_ramp=False, color_mode='RGB',
+        yaf_img_grayscale=False, factor_red=1.0, factor_green=1.0, factor_blue=1.0,
+        intensity=1.0, contrast=1.0, saturation=1.0, yaf_adj_hue=0.0,
+        yaf_trilinear_level_bias=0.0, yaf_ewa_max_anisotropy=8.0, use_clamp=False,
+        noise_scale=0.25, noise_type='SOFT_NOISE', noise_depth=2, noise_basis='IMPROVED_PERLIN')
+
+
+def makeTextureSlot(texture, coords):
+    return Struct(
+        name=texture.name, texture=texture, use=True, texture_coords=coords, object=None,
+        blend_type='MIX', use_stencil=False, invert=False, use_rgb_to_intensity=False,
+        color=(1.0, 0.0, 1.0), default_value=1.0,
+        mapping_x='X', mapping_y='Y', mapping_z='Z', mapping='FLAT',
+        scale=(1.0, 1.0, 1.0), offset=(0.0, 0.0, 0.0),
+        use_map_color_diffuse=True, diffuse_color_factor=1.0,
+        use_map_mirror=False, mirror_factor=1.0,
+        use_map_alpha=False, alpha_factor=1.0,
+        use_map_translucency=False, translucency_factor=1.0,
+        use_map_raymir=False, raymir_factor=1.0,
+        use_map_normal=True, normal_factor=0.5,
+        use_map_hardness=False, hardness_factor=1.0,
+        use_map_diffuse=False, diffuse_factor=1.0,
+        use_map_warp=False, warp_factor=0.0,
+        use_map_displacement=False, displacement_factor=0.2,
+        use_map_specular=False, specular_factor=1.0,
+        use_map_color_spec=False, specular_color_factor=1.0,
+        use_map_ambient=False, ambient_factor=1.0)
+
+
+def makeMaterial(name, matType, textures, coords='ORCO'):
+    # 18 texture slots like Blender, the unused ones empty
+    slots = [makeTextureSlot(tex, coords) for tex in textures]
+    slots += [None] * (18 - len(slots))
+    return Struct(
+        name=name, mat_type=matType, pass_index=0, texture_slots=slots, clay_exclude=False,
+        diffuse_color=(0.8, 0.8, 0.8), mirror_color=(1.0, 1.0, 1.0), glossy_color=(1.0, 1.0, 1.0),
+        coat_mir_col=(1.0, 1.0, 1.0), specular_reflect=0.0, diffuse_reflect=1.0,
+        glossy_reflect=0.5, transparency=0.0, translucency=0.0, transmit_filter=1.0, emit=0.0,
+        fresnel_effect=False, IOR_reflection=1.8, IOR_refraction=1.52, visibility='normal',
+        receive_shadows=True, flat_material=False, additionaldepth=0,
+        transparentbias_factor=0.0, transparentbias_multiply_raydepth=False, samplingfactor=1.0,
+        wireframe_amount=0.0, wireframe_color=(1.0, 1.0, 1.0), wireframe_thickness=0.01,
+        wireframe_exponent=0.0, brdf_type='lambert', sigma=0.1, exponent=500.0,
+        as_diffuse=False, anisotropic=False, exp_u=50.0, exp_v=50.0)
+
+
+def makeLamp(name, lampType, location):
+    lamp = Struct(
+        name=name, lamp_type=lampType, yaf_energy=1.0, color=(1.0, 1.0, 1.0),
+        create_geometry=False, use_sphere=False, yaf_sphere_radius=1.0, yaf_samples=16,
+        angle=0.5, light_enabled=True, cast_shadows=True,
+        caustic_photons=True, diffuse_photons=True, photon_only=False)
+    return Struct(name=name, type='LAMP', data=lamp, matrix_world=Matrix.Translation(location))
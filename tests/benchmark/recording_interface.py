@@ -0,0 +1,270 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Pure Python stand-in for the yafaray_v3_interface module. It implements the
+# part of yafrayInterface_t the exporter uses, counts and times every call and
+# can keep the calls with their arguments, so the exporter can be run and
+# measured without a YafaRay Core build. The module itself is registered as
+# yafaray_v3_interface by the benchmark, the SWIG helpers the exporter uses
+# (matrix4x4_t, new_floatArray...) are at module level like in the real one.
+
+import time
+from functools import wraps
+
+
+class CallStats(object):
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.time = 0.0
+
+
+def recorded(func):
+    name = func.__name__
+
+    @wraps(func)
+    def call(self, *args):
+        start = time.perf_counter()
+        result = func(self, *args)
+        elapsed = time.perf_counter() - start
+
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = CallStats(name)
+        stats.count += 1
+        stats.time += elapsed
+        if self.calls is not None:
+            self.calls.append((name, args))
+
+        return result
+
+    return call
+
+
+class RecordingInterface(object):
+    # Only the per call entry points, like the YafaRay Core builds without the bulk interface
+    def __init__(self, store=False):
+        self.stats = {}
+        self.calls = [] if store else None
+        self.nextID = 1
+        self.vertices = 0
+        self.uvs = 0
+
+    def reset(self):
+        self.stats = {}
+        if self.calls is not None:
+            self.calls = []
+
+    def callCount(self):
+        return sum(stats.count for stats in self.stats.values())
+
+    def callTime(self):
+        return sum(stats.time for stats in self.stats.values())
+
+    def sortedStats(self):
+        return sorted(self.stats.values(), key=lambda stats: stats.count, reverse=True)
+
+    @recorded
+    def getNextFreeID(self):
+        ID = self.nextID
+        self.nextID += 1
+        return ID
+
+    @recorded
+    def paramsClearAll(self):
+        pass
+
+    @recorded
+    def paramsSetString(self, name, value):
+        pass
+
+    @recorded
+    def paramsSetBool(self, name, value):
+        pass
+
+    @recorded
+    def paramsSetInt(self, name, value):
+        pass
+
+    @recorded
+    def paramsSetFloat(self, name, value):
+        pass
+
+    @recorded
+    def paramsSetColor(self, name, r, g, b, a=1.0):
+        pass
+
+    @recorded
+    def paramsSetPoint(self, name, x, y, z):
+        pass
+
+    @recorded
+    def paramsSetMemMatrix(self, name, matrix, transpose):
+        pass
+
+    @recorded
+    def paramsPushList(self):
+        pass
+
+    @recorded
+    def paramsEndList(self):
+        pass
+
+    @recorded
+    def startGeometry(self):
+        return True
+
+    @recorded
+    def endGeometry(self):
+        return True
+
+    @recorded
+    def startTriMesh(self, ID, vertices, triangles, hasOrco, hasUV, obType=0, pass_index=0):
+        self.vertices = 0
+        self.uvs = 0
+        return True
+
+    @recorded
+    def endTriMesh(self):
+        return True
+
+    @recorded
+    def startCurveMesh(self, ID, vertices, obType=0, pass_index=0):
+        self.vertices = 0
+        return True
+
+    @recorded
+    def endCurveMesh(self, material, strandStart, strandEnd, strandShape):
+        return True
+
+    @recorded
+    def addVertex(self, x, y, z, ox=0.0, oy=0.0, oz=0.0):
+        self.vertices += 1
+        return self.vertices - 1
+
+    @recorded
+    def addNormal(self, x, y, z):
+        pass
+
+    @recorded
+    def addUV(self, u, v):
+        self.uvs += 1
+        return self.uvs - 1
+
+    @recorded
+    def addTriangle(self, a, b, c, *args):
+        return True
+
+    @recorded
+    def smoothMesh(self, ID, angle):
+        return True
+
+    @recorded
+    def addInstance(self, baseID, matrix):
+        return True
+
+    @recorded
+    def createMaterial(self, name):
+        return "material:" + name
+
+    @recorded
+    def createTexture(self, name):
+        return "texture:" + name
+
+    @recorded
+    def createLight(self, name):
+        return "light:" + name
+
+    @recorded
+    def createCamera(self, name):
+        return "camera:" + name
+
+    @recorded
+    def createVolumeRegion(self, name):
+        return "volume:" + name
+
+    @recorded
+    def printInfo(self, message):
+        pass
+
+    @recorded
+    def printVerbose(self, message):
+        pass
+
+    @recorded
+    def printWarning(self, message):
+        pass
+
+    @recorded
+    def printError(self, message):
+        pass
+
+
+class BulkRecordingInterface(RecordingInterface):
+    # Also the whole buffer entry points of the newer YafaRay Core builds,
+    # the exporter looks for them with hasattr
+    @recorded
+    def addVertexArray(self, co, orco=None):
+        self.vertices += len(co)
+
+    @recorded
+    def addNormalArray(self, normals):
+        pass
+
+    @recorded
+    def addUVArray(self, uv):
+        first = self.uvs
+        self.uvs += len(uv)
+        return first
+
+    @recorded
+    def addTriangleArray(self, tris, uvTris, matIds, materials):
+        return True
+
+    @recorded
+    def addInstances(self, baseID, matrices):
+        return True
+
+    @recorded
+    def addCurveArray(self, co, counts, visible):
+        self.vertices += len(co)
+
+
+class matrix4x4_t(object):
+    def __init__(self):
+        self.values = [[0.0] * 4 for i in range(4)]
+
+    def setVal(self, row, col, value):
+        self.values[row][col] = value
+
+
+def new_floatArray(size):
+    return [0.0] * size
+
+
+def floatArray_setitem(array, index, value):
+    array[index] = value
+
+
+def delete_floatArray(array):
+    pass
+
+
+yafrayInterface_t = BulkRecordingInterface
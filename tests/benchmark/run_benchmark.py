@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+# Export benchmark without Blender and without YafaRay Core. yafObject,
+# yafMaterial, yafTexture and yafLight export synthetic scenes of growing
+# size through the bpy stand-in into the recording interface, and the export
+# time and interface calls per second are reported for every scene size.
+# Only Python 3 and numpy are needed:
+#
+#   python3 tests/benchmark/run_benchmark.py
+#   python3 tests/benchmark/run_benchmark.py --sizes 10,100,1000 --grid 16 --per-call
+#   python3 tests/benchmark/run_benchmark.py --save baseline.json
+#   python3 tests/benchmark/run_benchmark.py --compare baseline.json --tolerance 0.25
+#
+# With --compare the exit status is 1 when any scene size got slower than
+# the baseline by more than the tolerance, so it can be run as a regression
+# check on any Linux box. The scene export options (normals, cleanup,
+# spatial reordering...) can be switched on with --option name=value.
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+import types
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+PACKAGE = "yafaray_exporter"
+
+sys.path.insert(0, HERE)
+
+import blender_standin  # noqa: E402
+import recording_interface  # noqa: E402
+
+
+def loadExporter():
+    # The addon package __init__ registers the Blender UI and operators, so
+    # the parent packages are set up by hand and only the export modules are
+    # imported from the source tree
+    blender_standin.install()
+    sys.modules["yafaray_v3_interface"] = recording_interface
+
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ROOT]
+    io = types.ModuleType(PACKAGE + ".io")
+    io.__path__ = [os.path.join(ROOT, "io")]
+    package.io = io
+    sys.modules[PACKAGE] = package
+    sys.modules[PACKAGE + ".io"] = io
+
+    modules = types.SimpleNamespace()
+    for name in ("yaf_object", "yaf_material", "yaf_texture", "yaf_light"):
+        setattr(modules, name, importlib.import_module("{0}.io.{1}".format(PACKAGE, name)))
+
+    return modules
+
+
+class SyntheticScene(object):
+    # numObjects grid meshes with two materials each, a material (shiny
+    # diffuse or glossy, ORCO or UV mapped) and a clouds texture for every
+    # four objects, one instanced mesh with numObjects instances and a lamp
+    # for every ten objects
+    def __init__(self, numObjects, gridSize, exportOptions):
+        self.scene = blender_standin.makeScene(**exportOptions)
+        numMaterials = max(numObjects // 4, 2)
+
+        self.textures = [blender_standin.makeTexture("Tex.{0:04d}".format(i)) for i in range(numMaterials)]
+        self.materials = []
+        for i, tex in enumerate(self.textures):
+            matType = "shinydiffusemat" if i % 2 == 0 else "glossy"
+            coords = "ORCO" if i % 3 == 0 else "UV"
+            self.materials.append(blender_standin.makeMaterial("Mat.{0:04d}".format(i), matType, [tex], coords))
+
+        self.objects = []
+        for i in range(numObjects):
+            mats = [self.materials[i % numMaterials], self.materials[(i + 1) % numMaterials]]
+            mesh = blender_standin.makeGridMesh("Mesh.{0:04d}".format(i), gridSize, mats)
+            location = (3.0 * (i % 32), 3.0 * (i // 32), 0.0)
+            self.objects.append(blender_standin.makeObject("Object.{0:04d}".format(i), mesh, location))
+
+        mesh = blender_standin.makeGridMesh("InstancedMesh", gridSize, self.materials[:1])
+        self.instanceBase = blender_standin.makeObject("InstancedObject", mesh, (0.0, 0.0, 0.0))
+        self.instanceMatrices = [blender_standin.Matrix.Translation((3.0 * i, -10.0, 0.0)) for i in range(numObjects)]
+
+        self.lamps = []
+        for i in range(max(numObjects // 10, 1)):
+            lampType = "point" if i % 2 == 0 else "sun"
+            self.lamps.append(blender_standin.makeLamp("Lamp.{0:04d}".format(i), lampType, (2.0 * i, 0.0, 5.0)))
+
+        self.triangles = (numObjects + 1) * gridSize * gridSize * 2
+
+
+def exportScene(modules, synthetic, yi, pipeline):
+    # Same order as yafaRayRenderEngine.exportScene: textures, materials, lamps, objects
+    scene = synthetic.scene
+    materialMap = {}
+
+    yaf_texture = modules.yaf_texture.yafTexture(yi)
+    for tex in synthetic.textures:
+        yaf_texture.writeTexture(scene, tex)
+
+    yaf_material = modules.yaf_material.yafMaterial(yi, materialMap, yaf_texture.loadedTextures)
+    yi.paramsClearAll()
+    yi.paramsSetString("type", "shinydiffusemat")
+    materialMap["default"] = yi.createMaterial("defaultMat")
+    for mat in synthetic.materials:
+        yaf_material.writeMaterial(mat, scene)
+
+    yaf_light = modules.yaf_light.yafLight(yi, False)
+    for lamp in synthetic.lamps:
+        yaf_light.createLight(yi, lamp, lamp.matrix_world)
+
+    yaf_object = modules.yaf_object.yafObject(yi, materialMap, False)
+    yaf_object.setScene(scene)
+    yaf_object.setInstanceChunkSize(scene.yafaray.export.instanceChunkSize)
+    if pipeline:
+        yaf_object.startPipeline(scene.yafaray.export.pipelineQueueSize)
+    try:
+        for obj in synthetic.objects:
+            yaf_object.writeObject(obj)
+
+        baseID = yaf_object.writeInstanceBase(synthetic.instanceBase)
+        for matrix in synthetic.instanceMatrices:
+            yaf_object.writeInstance(baseID, matrix, synthetic.instanceBase.name)
+        yaf_object.flushInstances()
+    finally:
+        yaf_object.finishPipeline()
+
+
+def runSize(modules, numObjects, args, exportOptions):
+    synthetic = SyntheticScene(numObjects, args.grid, exportOptions)
+    interfaceType = recording_interface.RecordingInterface if args.per_call else recording_interface.BulkRecordingInterface
+
+    # best of the repeats, the first one also warms up the imports and caches
+    best = None
+    for repeat in range(args.repeat):
+        yi = interfaceType(store=args.store)
+        start = time.perf_counter()
+        exportScene(modules, synthetic, yi, args.pipeline)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, yi)
+
+    elapsed, yi = best
+    calls = yi.callCount()
+    return {
+        "objects": numObjects,
+        "triangles": synthetic.triangles,
+        "time": elapsed,
+        "calls": calls,
+        "callsPerSecond": calls / elapsed if elapsed > 0 else 0.0,
+        "interfaceTime": yi.callTime(),
+        "stats": [(stats.name, stats.count, stats.time) for stats in yi.sortedStats()],
+    }
+
+
+def parseOption(text):
+    name, _, value = text.partition("=")
+    for convert in (int, float):
+        try:
+            return name, convert(value)
+        except ValueError:
+            pass
+    if value in {"True", "False"}:
+        return name, value == "True"
+    return name, value
+
+
+def printResults(results, showCalls):
+    print("{0:>8} {1:>10} {2:>10} {3:>10} {4:>12} {5:>12}".format("objects", "triangles", "time (s)", "calls", "calls/s", "tris/s"))
+    for result in results:
+        print("{0:>8d} {1:>10d} {2:>10.4f} {3:>10d} {4:>12.0f} {5:>12.0f}".format(
+            result["objects"], result["triangles"], result["time"], result["calls"],
+            result["callsPerSecond"], result["triangles"] / result["time"]))
+
+    if showCalls and results:
+        result = results[-1]
+        print("\nInterface calls for {0} objects:".format(result["objects"]))
+        for name, count, seconds in result["stats"]:
+            print("  {0:<20} {1:>10d} {2:>10.4f} s".format(name, count, seconds))
+
+
+def compareResults(results, baselinePath, tolerance):
+    with open(baselinePath) as f:
+        baseline = {result["objects"]: result for result in json.load(f)["results"]}
+
+    regressions = 0
+    for result in results:
+        base = baseline.get(result["objects"])
+        if base is None:
+            continue
+        ratio = result["time"] / base["time"] if base["time"] > 0 else 1.0
+        slower = ratio > 1.0 + tolerance
+        regressions += slower
+        print("{0:>8d} objects: {1:.4f} s vs {2:.4f} s baseline ({3:+.1f}%){4}".format(
+            result["objects"], result["time"], base["time"], (ratio - 1.0) * 100.0, "  REGRESSION" if slower else ""))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the YafaRay exporter with synthetic scenes and a recording interface")
+    parser.add_argument("--sizes", default="10,40,160", help="comma separated object counts, one scene per count")
+    parser.add_argument("--grid", type=int, default=32, help="quads per side of every grid mesh")
+    parser.add_argument("--repeat", type=int, default=3, help="exports per scene size, the fastest one is reported")
+    parser.add_argument("--per-call", action="store_true", help="interface without the bulk entry points")
+    parser.add_argument("--pipeline", action="store_true", help="use the pipelined geometry export")
+    parser.add_argument("--store", action="store_true", help="keep every call with its arguments in the interface")
+    parser.add_argument("--option", action="append", default=[], metavar="NAME=VALUE", help="scene export option, such as exportNormals=True")
+    parser.add_argument("--calls", action="store_true", help="list the interface calls of the largest scene")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON, to be used as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare the export times with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown allowed by --compare, 0.2 is 20%%")
+    args = parser.parse_args(argv)
+
+    modules = loadExporter()
+    exportOptions = dict(parseOption(option) for option in args.option)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results = [runSize(modules, size, args, exportOptions) for size in sizes]
+    printResults(results, args.calls)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"grid": args.grid, "perCall": args.per_call, "options": exportOptions, "results": results}, f, indent=1)
+
+    if args.compare:
+        print("")
+        if compareResults(results, args.compare, args.tolerance):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -140,6 +140,9 @@ class YAFA_V3_MT_logging(RenderButtonsPanel, Panel):
         col = split.column()
         col.prop(scene.yafaray.logging, "savePreset")
 
+        row = layout.row()
+        row.prop(scene.yafaray.logging, "exportProfiler")
+
         if scene.yafaray.logging.saveLog or scene.yafaray.logging.saveHTML or scene.yafaray.logging.savePreset or scene.yafaray.logging.paramsBadgePosition == "top" or scene.yafaray.logging.paramsBadgePosition == "bottom":
                 if scene.gs_type_render == "into_blender" and not scene.gs_secondary_file_output:
                         row = layout.row()
@@ -199,6 +202,74 @@ class YAFA_V3_MT_clay_render(RenderButtonsPanel, Panel):
             col.prop(scene, "gs_clay_render_keep_normals")
 
 
+class YAFA_V3_PT_export_optimization(RenderButtonsPanel, Panel):
+    bl_label = "Export Optimization Settings"
+    COMPAT_ENGINES = {'YAFA_V3_RENDER'}
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        export = context.scene.yafaray.export
+
+        split = layout.split(percentage=0.5)
+        col = split.column()
+        col.prop(export, "geometryCache", toggle=True)
+        col = split.column()
+        sub = col.column()
+        sub.enabled = export.geometryCache
+        sub.prop(export, "geometryCacheSize")
+
+        split = layout.split(percentage=0.5)
+        col = split.column()
+        col.prop(export, "pipelinedExport", toggle=True)
+        col = split.column()
+        sub = col.column()
+        sub.enabled = export.pipelinedExport
+        sub.prop(export, "pipelineQueueSize")
+
+        split = layout.split(percentage=0.5)
+        col = split.column()
+        col.prop(export, "indexedUVs", toggle=True)
+        col.prop(export, "zeroCopyMeshes", toggle=True)
+        col.prop(export, "exportNormals", toggle=True)
+        col.prop(export, "cleanGeometry", toggle=True)
+        col.prop(export, "spatialReorder", toggle=True)
+        col = split.column()
+        sub = col.column()
+        sub.enabled = context.scene.render.use_instances
+        sub.prop(export, "autoInstancing", toggle=True)
+        sub.prop(export, "instanceChunkSize")
+
+        split = layout.split(percentage=0.5)
+        col = split.column()
+        col.prop(export, "frustumCulling", toggle=True)
+        col = split.column()
+        sub = col.column()
+        sub.enabled = export.frustumCulling
+        sub.prop(export, "cullingMode", text="")
+        sub.prop(export, "cullingMargin")
+
+        split = layout.split(percentage=0.5)
+        col = split.column()
+        col.prop(export, "screenSizeLOD", toggle=True)
+        col = split.column()
+        sub = col.column()
+        sub.enabled = export.screenSizeLOD
+        sub.prop(export, "lodTrianglesPerPixel")
+        sub.prop(export, "lodDecimate")
+
+        split = layout.split(percentage=0.5)
+        col = split.column()
+        col.prop(export, "callTape", toggle=True)
+        col = split.column()
+        sub = col.column()
+        sub.enabled = export.callTape
+        sub.prop(export, "callTapeDirectory", text="")
+        sub.prop(export, "callTapeMaxSize")
+
+        layout.prop(export, "incrementalExport", toggle=True)
+        layout.prop(export, "interfacePool", toggle=True)
+
 
 if __name__ == "__main__":  # only for live edit.
     import bpy
@@ -62,6 +62,22 @@ class YAFA_V3_PT_strand_settings(Panel):
             else:
                 col.prop(tan, "uv_layer", text="")
 
+            layout.separator()
+            layout.prop(yaf_mat, "strand_lod")
+
+            split = layout.split()
+            split.active = yaf_mat.strand_lod
+
+            col = split.column()
+            col.prop(yaf_mat, "strand_lod_angle")
+            col.prop(yaf_mat, "strand_lod_density")
+
+            col = split.column()
+            col.prop(yaf_mat, "strand_lod_camera")
+            sub = col.column()
+            sub.active = yaf_mat.strand_lod_camera
+            sub.prop(yaf_mat, "strand_lod_pixels")
+
 
 if __name__ == "__main__":  # only for live edit.
     import bpy